@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from entity import *
+from level import *
+from game import *
+from renderer import compose_frame, camera, game_size
+
+# every combination of these is benchmarked
+map_sizes: list[tuple[int, int]] = [(200, 100), (500, 500), (1000, 1000)]
+zombie_counts: list[int] = [0, 50, 200]
+
+# a scenario counts as a regression once it's this much slower than the baseline
+regression_tolerance: float = 0.2
+
+# how long a fresh process may take to get to its first frame, in seconds
+startup_budget: float = 0.5
+
+# what main.py does before drawing its first frame, minus the terminal.
+# prints the wall clock time once the frame is ready
+first_frame_script: str = """
+import time
+from main import *
+streams.seed({seed})
+level = cached_level({size}, {seed}, {cache_dir!r})
+game = Game(level)
+game.start()
+player = game.player
+cam_x, cam_y = camera(level, player, game_size)
+compose_frame(level, game.active_visibility, player, cam_x, cam_y, game_size)
+print(time.time())
+"""
+
+def setup(size, zombies, seed) -> Game:
+    # a level with zombies scattered on the floor around the player
+    streams.seed(seed)
+    level = Level(size, seed)
+    game = Game(level)
+    player = game.player
+
+    rng = np.random.default_rng(seed)
+    x0, y0 = max(0, player.x - 30), max(0, player.y - 30)
+    x1, y1 = min(size[0], player.x + 31), min(size[1], player.y + 31)
+    ys, xs = np.nonzero(level.transparent[y0:y1, x0:x1])
+    for i in rng.permutation(len(xs)):
+        if zombies == 0:
+            break
+        x, y = x0 + int(xs[i]), y0 + int(ys[i])
+        if not level.entities.at(x, y) and (x, y) != (player.x, player.y):
+            level.add_entity(Zombie(x, y))
+            zombies -= 1
+
+    game.start()
+    return game
+
+def play(game, turns, seed) -> None:
+    # a random walk, with the screen rendered after every input
+    rng = random.Random(seed)
+    player = game.player
+    directions = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+    level = game.level
+
+    for _ in range(turns):
+        dx, dy = rng.choice(directions)
+        game.step(dx, dy, "attack" if rng.random() < 0.1 else "move")
+
+        with game.profiler.phase("render"):
+            cam_x, cam_y = camera(level, player, game_size)
+            compose_frame(level, game.active_visibility, player, cam_x, cam_y, game_size)
+
+def run_scenario(size, zombies, turns, seed) -> dict:
+    start = time.perf_counter()
+    game = setup(size, zombies, seed)
+    setup_time = time.perf_counter() - start
+
+    game.profiler.enabled = True
+    start = time.perf_counter()
+    play(game, turns, seed)
+    elapsed = time.perf_counter() - start
+
+    # memory is measured on a second run of the same scenario, since
+    # tracing allocations slows everything down
+    tracemalloc.start()
+    play(setup(size, zombies, seed), turns, seed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "size": list(size),
+        "zombies": zombies,
+        "turns": turns,
+        "setup_seconds": setup_time,
+        "turns_per_sec": turns / elapsed,
+        # average seconds spent in each phase per input
+        "phases": {name: t / turns for name, t in sorted(game.profiler.totals.items())},
+        "p95": {name: game.profiler.percentiles(name, (95,))[0] for name in sorted(game.profiler.samples)},
+        "counters": {name: n / turns for name, n in sorted(game.profiler.count_totals.items())},
+        "entities_left": len(game.level.entities),
+        "fingerprint": game.fingerprint(),
+        "peak_memory_bytes": peak,
+    }
+
+def time_to_first_frame(size, seed, cache_dir) -> float:
+    # seconds from launching a new interpreter to its first frame
+    script = first_frame_script.format(size=size, seed=seed, cache_dir=cache_dir)
+    start = time.time()
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(out.stdout) - start
+
+def startup(seed, runs=3) -> dict[str, float]:
+    # time to first frame with nothing cached, then with the level
+    # cached. startup times are noisy, so each is the best of a few runs
+    results = {}
+    for size in map_sizes:
+        cold = []
+        for _ in range(runs):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cold.append(time_to_first_frame(size, seed, cache_dir))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            time_to_first_frame(size, seed, cache_dir)
+            warm = [time_to_first_frame(size, seed, cache_dir) for _ in range(runs)]
+        results[f"{size[0]}x{size[1]} cold"] = min(cold)
+        results[f"{size[0]}x{size[1]} warm"] = min(warm)
+    return results
+
+def compare(results, baseline) -> list[str]:
+    # scenarios that got slower than the baseline by more than the tolerance
+    before = {(tuple(r["size"]), r["zombies"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results["results"]:
+        old = before.get((tuple(r["size"]), r["zombies"]))
+        if old is not None and r["turns_per_sec"] < old["turns_per_sec"] * (1 - regression_tolerance):
+            regressions.append(f"{r['size'][0]}x{r['size'][1]} with {r['zombies']} zombies: {old['turns_per_sec']:.0f} -> {r['turns_per_sec']:.0f} turns/sec")
+        if old is not None and old.get("fingerprint") not in (None, r["fingerprint"]) and (old["turns"], baseline["seed"]) == (r["turns"], results["seed"]):
+            regressions.append(f"{r['size'][0]}x{r['size'][1]} with {r['zombies']} zombies: played out differently")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark turn throughput without a terminal.")
+    parser.add_argument("--turns", type=int, default=300, help="inputs per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="earlier results to check for regressions against")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "seed": args.seed,
+        "results": [],
+    }
+
+    for size in map_sizes:
+        for zombies in zombie_counts:
+            r = run_scenario(size, zombies, args.turns, args.seed)
+            results["results"].append(r)
+            phases = "  ".join(f"{name} {t * 1000:.3f}ms" for name, t in r["phases"].items() if name != "turn")
+            print(f"{size[0]:>5}x{size[1]:<5} {zombies:>4} zombies  {r['turns_per_sec']:>8.0f} turns/sec  {r['peak_memory_bytes'] / 2**20:>7.1f} MiB  {phases}")
+
+    results["startup"] = startup(args.seed)
+    over_budget = []
+    for name, t in results["startup"].items():
+        print(f"{name:>17} first frame in {t * 1000:>6.0f}ms")
+        if t > startup_budget:
+            over_budget.append(f"{name} took {t * 1000:.0f}ms to get to the first frame, the budget is {startup_budget * 1000:.0f}ms")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for line in over_budget:
+        print("over budget:", line)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f))
+        for line in regressions:
+            print("regression:", line)
+        if regressions:
+            return 1
+
+    return 1 if over_budget else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -1,7 +1,9 @@
-import curses
-import random
+import numpy as np
 
 from enum import StrEnum
+from functools import cache
+from utils import *
+from rng import *
 
 class StatusEffect(StrEnum):
     Bleeding = "Bleeding"
@@ -10,8 +12,53 @@ class StatusEffect(StrEnum):
     Infected = "Infected"
     Starving = "Starving"
 
+class Column:
+    # an attribute kept in a numpy column of the EntityStore the entity is
+    # spawned into, so systems can update every entity's at once. while
+    # the entity isn't in a store it lives in a slot named _<attribute>
+    def __init__(self, dtype):
+        self.dtype: np.dtype = np.dtype(dtype)
+
+    def __set_name__(self, owner, name):
+        self.name: str = name
+        self.slot: str = "_" + name
+
+    def __get__(self, entity, owner=None):
+        if entity is None:
+            return self
+        store = entity.store
+        if store is None:
+            return getattr(entity, self.slot)
+        # indexing a memoryview is a lot quicker than
+        # indexing the array for a single value
+        return store.views[self.name][entity.row]
+
+    def __set__(self, entity, value):
+        store = entity.store
+        if store is None:
+            setattr(entity, self.slot, value)
+        else:
+            store.views[self.name][entity.row] = value
+
 class Entity:
+    __slots__ = (
+        "_x", "_y", "_health", "max_health", "name", "description", "char", "color",
+        "_solid", "_seethrough", "detectable", "marked_for_death",
+        "handle", "store", "row", "speed", "next_turn",
+    )
+
+    x = Column(np.int32)
+    y = Column(np.int32)
+    health = Column(np.int16)
+    solid = Column(bool)
+    seethrough = Column(bool)
+
     def __init__(self, x, y, health, name, description, char, color, solid=True, seethrough=False, detectable=True):
+        # set by the EntityStore the entity is spawned into, must
+        # come first since the columns below check it
+        self.store = None
+        self.row: int | None = None
+
         self.x = x
         self.y = y
         self.health = self.max_health = health
@@ -24,22 +71,29 @@ class Entity:
         self.detectable = detectable
 
         self.marked_for_death = False
+
+        # set by the EntityStore the entity is spawned into
+        self.handle: int | None = None
+
+        # how many actions the entity gets per action_cost of time
+        self.speed: int = 100
+        # set by the Scheduler when the entity's next turn is queued
+        self.next_turn: int | None = None
     
-    def draw(self, level, current_vis, stdscr, ox, oy, cam_x, cam_y, gamesize=(78,22), invert = False):
-        if 0 <= self.y - cam_y < gamesize[1] and 0 <= self.x - cam_x < gamesize[0]:
-            if level.seen[self.y * level.size[0] + self.x]:
-                if current_vis[self.y * level.size[0] + self.x]:
-                    char, color = self.char, self.color
-                else:
-                    # entities that have been seen, but are not
-                    # actively visible, are drawn in blue
-                    if self.detectable:
-                        char, color = self.char, 3
-                    else:
-                        char, color = level.get_at(self.x, self.y)[0], 3
+    def glyph(self, level, current_vis, invert = False) -> tuple[str, int]:
+        if level.seen[self.y, self.x]:
+            if current_vis[self.y, self.x]:
+                char, color = self.char, self.color
             else:
-                char, color = ' ', 0
-            stdscr.addch(oy + 1 + self.y - cam_y, ox + 1 + self.x - cam_x, char, curses.color_pair(color if not invert else 8))
+                # entities that have been seen, but are not
+                # actively visible, are drawn in blue
+                if self.detectable:
+                    char, color = self.char, 3
+                else:
+                    char, color = level.get_at(self.x, self.y)[0], 3
+        else:
+            char, color = ' ', 0
+        return char, color if not invert else 8
     
     def on_bump_interact(self, player):
         pass
@@ -47,12 +101,52 @@ class Entity:
     def on_pass_over(self, player):
         pass
 
-    def on_my_turn(self, player):
+    def on_my_turn(self, player, level):
         pass
 
+    def path_cost(self) -> int:
+        # how much extra it costs a zombie to get through this
+        # entity's tile, for anything that has to be broken first
+        return 0
+
+    def next_turn_in(self) -> int | None:
+        # time until the entity's next turn, or None if it doesn't take
+        # turns. asked when the entity is spawned and after every turn
+        return None
+
+    def action_time(self) -> int:
+        return action_cost * 100 // self.speed
+
+    @classmethod
+    @cache
+    def columns(cls) -> dict[str, Column]:
+        return {name: value for klass in reversed(cls.__mro__) for name, value in vars(klass).items() if isinstance(value, Column)}
+
+    def state(self) -> dict:
+        # every attribute of the entity, apart from where it's stored
+        state = {}
+        columns = self.columns()
+        for klass in reversed(type(self).__mro__):
+            for slot in getattr(klass, "__slots__", ()):
+                name = slot[1:] if slot[1:] in columns else slot
+                if name not in ["handle", "store", "row"]:
+                    state[name] = getattr(self, name)
+        return state
+
+    @classmethod
+    def from_state(cls, state) -> "Entity":
+        # the opposite of state, without calling __init__
+        entity = object.__new__(cls)
+        entity.store = entity.row = entity.handle = entity.next_turn = None
+        for name, value in state.items():
+            setattr(entity, name, value)
+        return entity
+
 class Player(Entity):
-    def __init__(self, x, y):
-        super().__init__(x, y, 10, "You", "Yourself.", "@", random.randint(1, 6))
+    __slots__ = ("food", "max_food", "water", "max_water", "sight_radius", "noise", "action", "statuses", "last_sleep_time")
+
+    def __init__(self, x, y, color=None):
+        super().__init__(x, y, 10, "You", "Yourself.", "@", streams.worldgen.randint(1, 6) if color is None else color)
 
         self.food = self.max_food = 10
         self.water = self.max_water = 10
@@ -74,19 +168,25 @@ class Player(Entity):
     def remove_status(self, status):
         self.statuses.remove(status)
 
+    def action_time(self) -> int:
+        # exhaustion slows the player down, which gives
+        # everything else twice as many turns
+        if StatusEffect.Exhausted in self.statuses:
+            return 2 * super().action_time()
+        return super().action_time()
+
 class Door(Entity):
+    __slots__ = ("open", "locked")
+
     def __init__(self, x, y, locked=None):
         super().__init__(x, y, 5, "Wooden Door", "A simple wooden door.", "+", 1)
         self.open = False
-        self.locked = random.random() < 0.8 if locked is None else locked
+        self.locked = streams.worldgen.random() < 0.8 if locked is None else locked
 
     def on_bump_interact(self, player):
         if player.action == "attack":
-            dmg = random.randint(2, 3)
             old_health = self.health
-            self.health = max(0, self.health - dmg)
-            if self.health == 0:
-                self.marked_for_death = True
+            if self.smash(streams.combat.randint(2, 3)):
                 return f"You `rbreak down` the `g{self.name}`."
             return f"You deal `y{old_health - self.health}` damage to the `g{self.name}`."
         if self.locked:
@@ -95,23 +195,30 @@ class Door(Entity):
         self.solid = False
         self.seethrough = True
         self.char = "/"
+
+    def smash(self, dmg) -> bool:
+        # returns whether the door was broken down
+        self.health = max(0, self.health - dmg)
+        if self.health == 0:
+            self.marked_for_death = True
+        return self.health == 0
+
+    def path_cost(self) -> int:
+        return 0 if self.open else door_path_cost
     
 class Window(Entity):
+    __slots__ = ("open", "broken", "locked")
+
     def __init__(self, x, y, locked=None):
         super().__init__(x, y, 5, "Window", "A window.", "=", 5, True, True)
         self.open = False
         self.broken = False
-        self.locked = random.random() < 0.8 if locked is None else locked
+        self.locked = streams.worldgen.random() < 0.8 if locked is None else locked
 
     def on_bump_interact(self, player):
         if player.action == "attack":
-            dmg = random.randint(2, 3)
             old_health = self.health
-            self.health = max(0, self.health - dmg)
-            if self.health == 0:
-                self.broken = True
-                self.char = 'X'
-                self.solid = False
+            if self.smash(streams.combat.randint(2, 3)):
                 return f"You `rbreak` the `g{self.name}`."
             return f"You deal `y{old_health - self.health}` damage to the `g{self.name}`."
         if self.locked:
@@ -122,62 +229,116 @@ class Window(Entity):
         self.solid = False
         self.char = "'"
     
+    def smash(self, dmg) -> bool:
+        # returns whether the window was broken
+        self.health = max(0, self.health - dmg)
+        if self.health == 0:
+            self.broken = True
+            self.char = 'X'
+            self.solid = False
+        return self.health == 0
+
+    def path_cost(self) -> int:
+        return 0 if self.open or self.broken else window_path_cost
+
     def on_pass_over(self, player):
         if self.broken:
-            if random.random() < 0.8:
+            if streams.status.random() < 0.8:
                 player.add_status(StatusEffect.Bleeding)
                 return "You get `rcut` by the `gbroken glass`."
             return "You `rpass through` the `gwindow` safely."
 
 class Corpse(Entity):
-    def __init__(self, x, y):
-        super().__init__(x, y, 8, "Corpse", "A person's corpse.", "&", 0, True, True, False)
+    __slots__ = ("_born", "_deadline", "time_to_turn")
 
-        self.time_since_beginning = 0
-        self.time_to_turn = random.randint(80, 200)
+    # game time the entity was added to a level, and the game time it
+    # turns, both -1 until then. see Lifecycle
+    born = Column(np.int64)
+    deadline = Column(np.int64)
 
-        self.to_zombie = False
+    def __init__(self, x, y, time_to_turn=None):
+        super().__init__(x, y, 8, "Corpse", "A person's corpse.", "&", 0, True, True, False)
+
+        self.born = self.deadline = -1
+        # turns until the corpse gets back up as a zombie
+        self.time_to_turn = streams.ai.randint(80, 200) if time_to_turn is None else time_to_turn
     
     def on_bump_interact(self, player):
         if player.action == "attack":
             old_health = self.health
-            self.health = max(0, self.health - random.randint(1, 2))
+            self.health = max(0, self.health - streams.combat.randint(1, 2))
             if self.health == 0:
                 self.marked_for_death = True
-                self.to_zombie = False
                 return f"You manage to `rdismember` the `g{self.name}`."
             return f"You deal `y{old_health - self.health}` damage to the `g{self.name}`."
-        
-    def on_my_turn(self, player):
-        self.time_since_beginning += 1
-
-        if self.time_since_beginning >= self.time_to_turn:
-            self.marked_for_death = True
-            self.to_zombie = True
 
 class Zombie(Entity):
+    __slots__ = ("_born", "_deadline", "time_to_turn", "_is_bloater", "_sense_radius", "_sees_player", "_hears_player")
+
+    born = Column(np.int64)
+    deadline = Column(np.int64)
+    is_bloater = Column(bool)
+    sense_radius = Column(np.int16)
+    # set at the start of every turn by the level's Perception
+    sees_player = Column(bool)
+    hears_player = Column(bool)
+
     def __init__(self, x, y):
         super().__init__(x, y, 8, "Zombie", "A zombie.", "z", 2, True, False, False)
 
-        self.time_since_beginning = 0
-        self.time_to_turn = random.randint(800, 2000)
+        self.born = self.deadline = -1
+        # turns until the zombie becomes a bloater
+        self.time_to_turn = streams.ai.randint(800, 2000)
 
         # zombies are bloaters 1% of the time
-        self.is_bloater = random.random() < 0.01
+        self.is_bloater = streams.ai.random() < 0.01
         if self.is_bloater:
             self.char = 'B'
+
+        # how close the player has to be for the zombie to see them
+        self.sense_radius = 6
+        self.sees_player = self.hears_player = False
     
     def on_bump_interact(self, player):
         old_health = self.health
-        self.health = max(0, self.health - random.randint(1, 2))
+        self.health = max(0, self.health - streams.combat.randint(1, 2))
         if self.health == 0:
             self.marked_for_death = True
             return f"You manage to `rfell` the `g{self.name}`."
         return f"You deal `y{old_health - self.health}` damage to the `g{self.name}`."
         
-    def on_my_turn(self, player):
-        self.time_since_beginning += 1
+    def on_my_turn(self, player, level):
+        if abs(player.x - self.x) + abs(player.y - self.y) == 1:
+            dmg = streams.combat.randint(1, 2)
+            player.health = max(0, player.health - dmg)
+            return f"The `g{self.name}` `rbites` you for `y{dmg}` damage."
+
+        # head for the player if it can see them, otherwise shamble
+        # toward the loudest noise around if it can hear the player.
+        # what it perceives was worked out for every zombie at the
+        # start of the turn
+        nav = level.navigation
+        if self.sees_player:
+            dist = nav.toward_player(player)
+        elif self.hears_player:
+            dist = nav.toward_noise(player)
+        else:
+            return
+
+        step = dist.step(self.x, self.y)
+        if step is None:
+            return
+
+        x, y = self.x + step[0], self.y + step[1]
+        blocker = next((e for e in level.entities.at(x, y) if e.solid), None)
+        if blocker is None:
+            level.move_entity(self, x, y)
+        elif blocker.path_cost():
+            # doors and windows in the way get broken down
+            blocker.smash(streams.combat.randint(1, 2))
+            level.sync_entity(blocker)
+            if blocker.marked_for_death:
+                level.lifecycle.kill(blocker)
 
-        if self.time_since_beginning >= self.time_to_turn:
-            self.is_bloater = True
-            self.char = 'B'
\ No newline at end of file
+    def next_turn_in(self) -> int | None:
+        return self.action_time()
@@ -0,0 +1,141 @@
+import numpy as np
+
+from entity import *
+
+class EntityStore:
+    def __init__(self, size: tuple[int, int]):
+        self.size: tuple[int, int] = size
+
+        # handle -> entity, in the order they were spawned
+        self.entities: dict[int, Entity] = {}
+        self.next_handle: int = 0
+
+        # every entity standing on a tile, there can be more than one
+        self.tiles: dict[tuple[int, int], list[Entity]] = {}
+
+        # the column attributes of every entity, one row each. rows of
+        # despawned entities are reused, so a row is only meaningful
+        # where alive is set, and kind tells what sort of entity it is
+        self.capacity: int = 0
+        self.columns: dict[str, np.ndarray] = {}
+        # memoryviews of the columns, for reading and writing one value
+        self.views: dict[str, memoryview] = {}
+        self.alive: np.ndarray = np.zeros(0, dtype=bool)
+        self.kind: np.ndarray = np.zeros(0, dtype=np.uint8)
+        self.kinds: dict[type, int] = {}
+        self.rows: list[Entity | None] = []
+        self.free_rows: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def __iter__(self):
+        return iter(self.entities.values())
+
+    def __reversed__(self):
+        return reversed(self.entities.values())
+
+    def __contains__(self, entity) -> bool:
+        return entity.handle is not None and self.entities.get(entity.handle) is entity
+
+    def get(self, handle) -> Entity | None:
+        return self.entities.get(handle)
+
+    def link(self, entity) -> None:
+        self.tiles.setdefault((entity.x, entity.y), []).append(entity)
+
+    def unlink(self, entity) -> None:
+        tile = self.tiles[(entity.x, entity.y)]
+        tile.remove(entity)
+        if not tile:
+            del self.tiles[(entity.x, entity.y)]
+
+    def grow(self) -> None:
+        capacity = max(64, self.capacity * 2)
+        for name, column in self.columns.items():
+            self.columns[name] = np.resize(column, capacity)
+            self.views[name] = memoryview(self.columns[name])
+        self.alive = np.resize(self.alive, capacity)
+        self.alive[self.capacity:] = False
+        self.kind = np.resize(self.kind, capacity)
+        self.rows.extend([None] * (capacity - self.capacity))
+        self.free_rows.extend(reversed(range(self.capacity, capacity)))
+        self.capacity = capacity
+
+    def kind_of(self, kind) -> int:
+        # the number used for a type of entity in the kind column,
+        # adding columns for any attributes it brings with it
+        number = self.kinds.get(kind)
+        if number is None:
+            number = self.kinds[kind] = len(self.kinds)
+            for name, column in kind.columns().items():
+                if name not in self.columns:
+                    self.columns[name] = np.zeros(self.capacity, dtype=column.dtype)
+                    self.views[name] = memoryview(self.columns[name])
+        return number
+
+    def select(self, kind) -> np.ndarray:
+        # the rows of every entity of a kind, for systems that work on all
+        # of them at once. self.rows[row] is the entity in a row
+        number = self.kinds.get(kind)
+        if number is None:
+            return np.zeros(0, dtype=np.intp)
+        return np.flatnonzero(self.alive & (self.kind == number))
+
+    def spawn(self, entity) -> int:
+        entity.handle = self.next_handle
+        self.next_handle += 1
+        self.entities[entity.handle] = entity
+
+        number = self.kind_of(type(entity))
+        if not self.free_rows:
+            self.grow()
+        row = self.free_rows.pop()
+        for name, column in entity.columns().items():
+            self.views[name][row] = getattr(entity, column.slot)
+        self.alive[row] = True
+        self.kind[row] = number
+        self.rows[row] = entity
+        entity.row = row
+        entity.store = self
+
+        self.link(entity)
+        return entity.handle
+
+    def despawn(self, entity) -> None:
+        if entity not in self:
+            return
+        self.unlink(entity)
+        del self.entities[entity.handle]
+        entity.handle = None
+
+        # hand the columns back to the entity
+        row = entity.row
+        entity.store = entity.row = None
+        for name, column in entity.columns().items():
+            setattr(entity, column.slot, self.views[name][row])
+        self.alive[row] = False
+        self.rows[row] = None
+        self.free_rows.append(row)
+
+    def move(self, entity, x, y) -> None:
+        self.unlink(entity)
+        entity.x, entity.y = x, y
+        self.link(entity)
+
+    def at(self, x, y) -> list[Entity]:
+        return self.tiles.get((x, y), [])
+
+    def in_rect(self, x0, y0, x1, y1) -> list[Entity]:
+        # every entity with x0 <= x < x1 and y0 <= y < y1
+        if not self.columns:
+            return []
+        x, y = self.columns["x"], self.columns["y"]
+        rows = np.flatnonzero(self.alive & (x >= x0) & (x < x1) & (y >= y0) & (y < y1))
+        return [self.rows[row] for row in rows]
+
+    def in_radius(self, x, y, radius) -> list[Entity]:
+        return [
+            e for e in self.in_rect(x - radius, y - radius, x + radius + 1, y + radius + 1)
+            if (e.x - x) ** 2 + (e.y - y) ** 2 <= radius ** 2
+        ]
@@ -0,0 +1,91 @@
+import numpy as np
+
+# a screen's worth of glyph codes and colors. everything is drawn into
+# one of these rather than straight to curses, so only what changed
+# since the last frame has to go out to the terminal, as runs of the
+# same color, one addstr each. nothing here needs a terminal, so frames
+# can be drawn and dumped as text without one
+class Framebuffer:
+    def __init__(self, size:tuple[int, int]):
+        self.size: tuple[int, int] = size
+        self.chars: np.ndarray = np.full((size[1], size[0]), ord(' '), dtype=np.uint32)
+        self.colors: np.ndarray = np.zeros((size[1], size[0]), dtype=np.uint8)
+
+    def clip(self, x, y, w, h) -> tuple[slice, slice] | None:
+        # the part of a rectangle that's on screen, as (rows, columns)
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.size[0], x + w), min(self.size[1], y + h)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return slice(y0, y1), slice(x0, x1)
+
+    def fill(self, x, y, w, h, char=' ', color=0) -> None:
+        area = self.clip(x, y, w, h)
+        if area is not None:
+            self.chars[area] = ord(char)
+            self.colors[area] = color
+
+    def put(self, x, y, char, color=0) -> None:
+        self.fill(x, y, 1, 1, char, color)
+
+    def blit(self, x, y, chars, colors) -> None:
+        # copies arrays of glyph codes and colors in with their top left at (x, y)
+        h, w = chars.shape
+        area = self.clip(x, y, w, h)
+        if area is not None:
+            rows, columns = area
+            source = np.s_[rows.start - y:rows.stop - y, columns.start - x:columns.stop - x]
+            self.chars[area] = chars[source]
+            self.colors[area] = colors[source]
+
+    def text(self, x, y, lines, w=None, h=None) -> None:
+        # writes text already split into runs by compile_text. runs are cut
+        # off at the edge of the box, or the screen, rather than wrapping
+        # onto the next line
+        right = self.size[0] if w is None else min(self.size[0], x + w)
+        bottom = self.size[1] if h is None else min(self.size[1], y + h)
+        for j, runs in enumerate(lines[:max(0, bottom - y)]):
+            i = x
+            for text, color in runs:
+                if i >= right:
+                    break
+                text = text[:right - i]
+                if text:
+                    self.chars[y + j, i:i + len(text)] = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+                    self.colors[y + j, i:i + len(text)] = color
+                i += len(text)
+
+    def runs(self, changed) -> list[tuple[int, int, str, int]]:
+        # (x, y, text, color) of the runs of same colored cells that have
+        # something changed in them, from the first changed cell of a run
+        # to the last. a run goes right over cells in between that haven't
+        # changed, which makes one addstr out of what would be a lot of
+        # little ones
+        rows = np.flatnonzero(changed.any(axis=1))
+        if not len(rows):
+            return []
+        w = self.size[0]
+        colors = self.colors[rows].ravel()
+        flat = changed[rows].ravel()
+        n = len(flat)
+
+        # runs start at the start of every row and wherever the color changes
+        starts = np.zeros(n, dtype=bool)
+        starts[::w] = True
+        starts[1:] |= colors[1:] != colors[:-1]
+        starts = np.flatnonzero(starts)
+
+        cells = np.arange(n)
+        first = np.minimum.reduceat(np.where(flat, cells, n), starts)
+        last = np.maximum.reduceat(np.where(flat, cells, -1), starts)
+        touched = last >= 0
+
+        first, last = first[touched], last[touched]
+        text = self.chars[rows].tobytes().decode("utf-32-le")
+        rows = rows.tolist()
+        # as python ints, which are a lot quicker to do arithmetic on one at a time
+        return [(i % w, rows[i // w], text[i:j + 1], color) for i, j, color in zip(first.tolist(), last.tolist(), colors[first].tolist())]
+
+    def dump(self) -> str:
+        # the glyphs as plain text, one line per row
+        return "\n".join(self.chars[y].tobytes().decode("utf-32-le").rstrip() for y in range(self.size[1]))
\ No newline at end of file
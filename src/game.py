@@ -0,0 +1,266 @@
+import hashlib
+import numpy as np
+
+from collections import OrderedDict
+
+from entity import *
+from level import *
+from utils import *
+from rng import *
+from profiler import *
+from markup import *
+
+import tcod.map
+
+# fields of view from the last few places the player stood, so standing
+# still, bumping into things and walking back the way they came don't
+# need tcod
+fov_cache_size: int = 64
+
+# the rules of the game, with no terminal attached. the curses front end
+# in main.py and the benchmarks both drive one of these by calling step
+# with the player's input
+class Game:
+    def __init__(self, level, messages=None, max_messages=5, profiler=None):
+        self.level: Level = level
+        self.player: Player | None = next((e for e in level.entities if isinstance(e, Player)), None)
+
+        self.messages: MessageLog = MessageLog(max_messages, () if messages is None else messages)
+
+        # how many turns the player has taken
+        self.turns: int = 0
+
+        self.active_visibility: np.ndarray = level.make_layer(bool)
+        # the part of the map the last fov was computed on
+        self.fov_window = np.s_[0:0, 0:0]
+        # (x, y, sight radius, level version) active_visibility is from
+        self.fov_key = None
+        # (x, y, sight radius) -> (level version, window, fov map of the
+        # window, fov), the most recently used last
+        self.fov_cache: OrderedDict[tuple[int, int, int], tuple[int, tuple, np.ndarray, np.ndarray]] = OrderedDict()
+        self.fov_hits: int = 0
+        self.fov_misses: int = 0
+
+        self.profiler: Profiler = Profiler() if profiler is None else profiler
+
+        # given every input when set, see replay.py
+        self.recorder = None
+
+    def start(self, fresh=True) -> None:
+        # the player wakes up making a bit more noise than usual. a game
+        # loaded from a save isn't fresh, its noise was saved with it
+        if fresh:
+            player = self.player
+            self.level.noise.emit(player.x, player.y, player.noise + 2, player.noise + 2)
+        self.update_visibility()
+
+    def fingerprint(self) -> str:
+        # a hash of the state of the game. the same seed and inputs always
+        # end up with the same one, whatever machine or options they ran with
+        level, player = self.level, self.player
+        digest = hashlib.sha1()
+        state = sorted((type(e).__name__, e.x, e.y, e.health, e.char) for e in level.entities)
+        digest.update(repr((state, level.scheduler.time, player.food, player.water, sorted(player.statuses))).encode())
+        for block in level.chars.blocks() if hasattr(level.chars, "blocks") else [level.chars]:
+            digest.update(block.tobytes())
+        return digest.hexdigest()
+
+    def add_message(self, msg: str) -> None:
+        self.messages.add(": " + msg)
+
+    def update_visibility(self) -> None:
+        level, player = self.level, self.player
+        key = player.x, player.y, player.sight_radius
+        if key + (level.version,) == self.fov_key:
+            # nothing the player can see could have changed
+            self.fov_hits += 1
+            self.profiler.count("fov cached", 1)
+            return
+
+        with self.profiler.phase("fov"):
+            window, fov, cached = self.field_of_view(key)
+            self.active_visibility[self.fov_window] = False
+            self.active_visibility[window] = fov
+            level.seen[window] |= fov
+            self.fov_window = window
+            self.fov_key = key + (level.version,)
+        self.profiler.count("fov cached", cached)
+        self.profiler.count("fov cells", 0 if cached else fov.size)
+
+    def field_of_view(self, key) -> tuple[tuple, np.ndarray, bool]:
+        # the window around the player and what they can see of it,
+        # and whether it came from the cache
+        level = self.level
+        entry = self.fov_cache.get(key)
+        if entry is not None:
+            version, window, fov_map, fov = entry
+            # the level has changed if the version has, but
+            # that only matters if it changed inside the window
+            if version == level.version or np.array_equal(fov_map, level.fov_map[window]):
+                self.fov_cache[key] = level.version, window, fov_map, fov
+                self.fov_cache.move_to_end(key)
+                self.fov_hits += 1
+                return window, fov, True
+
+        # only the square the player can possibly see is handed to
+        # tcod, so the cost depends on sight radius and not map size.
+        # the tiles directly next to the player are always visible,
+        # so the window is never smaller than that
+        x, y, radius = key
+        r = max(radius, 1)
+        x0, y0 = max(0, x - r), max(0, y - r)
+        x1, y1 = min(level.size[0], x + r + 1), min(level.size[1], y + r + 1)
+        window = np.s_[y0:y1, x0:x1]
+
+        fov_map = np.array(level.fov_map[window])
+        fov = tcod.map.compute_fov(fov_map, (y - y0, x - x0), radius, algorithm=tcod.constants.FOV_DIAMOND)
+        for i, j in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+            if x0 <= x + i < x1 and y0 <= y + j < y1:
+                fov[y + j - y0, x + i - x0] = True
+
+        self.fov_cache[key] = level.version, window, fov_map, fov
+        if len(self.fov_cache) > fov_cache_size:
+            self.fov_cache.popitem(last=False)
+        self.fov_misses += 1
+        return window, fov, False
+
+    def take_entity_turn(self, entity) -> None:
+        level = self.level
+
+        message = entity.on_my_turn(self.player, level)
+        if message is not None:
+            self.add_message(message)
+        level.sync_entity(entity)
+        if entity.marked_for_death:
+            level.lifecycle.kill(entity)
+        else:
+            delay = entity.next_turn_in()
+            if delay is not None:
+                level.scheduler.schedule(entity, delay)
+
+    def move_player(self, dx, dy) -> bool:
+        # returns whether the player actually moved
+        level, player = self.level, self.player
+        old_x, old_y = player.x, player.y
+
+        nx, ny = player.x + dx, player.y + dy
+        if level.get_at(nx, ny)[0] not in solids:
+            others = [e for e in level.entities.at(nx, ny) if e is not player]
+            blocker = next((e for e in others if e.solid), None)
+
+            if blocker is not None:
+                # if the player collides with an entity, bump interact with it
+                results = [(blocker, blocker.on_bump_interact(player))]
+            else:
+                level.move_entity(player, nx, ny)
+                results = [(entity, entity.on_pass_over(player)) for entity in others]
+
+            for entity, message in results:
+                if message is not None:
+                    self.add_message(message)
+                level.sync_entity(entity)
+                if entity.marked_for_death:
+                    level.lifecycle.kill(entity)
+
+        return player.x != old_x or player.y != old_y
+
+    def update_statuses(self) -> None:
+        level, player = self.level, self.player
+
+        if level.get_at(player.x, player.y)[0] == '~':
+            # if the player passes over blood, have a chance of infection
+            if streams.status.random() < 0.1 * (1 + (StatusEffect.Bleeding in player.statuses)):
+                if StatusEffect.Infected not in player.statuses:
+                    player.add_status(StatusEffect.Infected)
+                    self.add_message("You have become infected.")
+
+        for status in list(player.statuses):
+            match status:
+                case StatusEffect.Bleeding:
+                    player.health = max(0, player.health - 1)
+                    self.add_message("You `rbleed out`, dealing `y1` damage.")
+                    if streams.status.random() < 0.05:
+                        # 5% chance to stop bleeding
+                        player.remove_status(StatusEffect.Bleeding)
+                        self.add_message("You stop bleeding.")
+                    # put blood on the floor
+                    for i in range(-1, 2):
+                        for j in range(-1, 2):
+                            if streams.status.random() < 0.5:
+                                ch = level.get_at(player.x + i, player.y + j)[0]
+                                if ch == '.':
+                                    level.set_at(player.x + i, player.y + j, '~', 1)
+                case StatusEffect.Dehydrated:
+                    player.health = max(0, player.health - 1)
+                    self.add_message("You are dehyrdated and take `y1` damage.")
+                case StatusEffect.Exhausted:
+                    pass
+                case StatusEffect.Infected:
+                    if streams.status.random() < 0.1:
+                        # 10% chance of taking damage when infected
+                        self.add_message("You are infected, and take `y1` damage.")
+                case StatusEffect.Starving:
+                    player.health = max(0, player.health - 1)
+                    self.add_message("You are starving and take `y1` damage.")
+
+    def update_noise(self) -> None:
+        with self.profiler.phase("noise"):
+            # every value in the noise map decreases by one
+            self.level.noise.decay()
+
+            # we then propogate noise from the player's position again
+            self.level.noise.emit(self.player.x, self.player.y, self.player.noise)
+
+    def perceive(self) -> None:
+        with self.profiler.phase("perception"):
+            perceiving = self.level.perception.update(self.player, self.active_visibility[self.fov_window], self.fov_window)
+        self.profiler.count("perceiving", perceiving)
+
+    def take_turns(self) -> None:
+        with self.profiler.phase("entities"):
+            # everything whose turn comes up while the player
+            # is acting gets to take it
+            ticked = 0
+            for entity in self.level.scheduler.advance(self.player.action_time()):
+                self.take_entity_turn(entity)
+                ticked += 1
+        self.profiler.count("ticked", ticked)
+
+        with self.profiler.phase("lifecycle"):
+            risen = self.level.lifecycle.update()
+        self.profiler.count("risen", risen)
+
+    def step(self, dx, dy, action="move") -> bool:
+        # the player tries to move or attack in a direction. returns
+        # whether a turn went by, which is only when the player moved
+        if not (dx or dy):
+            return False
+
+        with self.profiler.phase("turn"):
+            moved = self.take_step(dx, dy, action)
+        if self.recorder is not None:
+            self.recorder.record(self, dx, dy, action)
+        return moved
+
+    def take_step(self, dx, dy, action) -> bool:
+        self.player.action = action
+        moved = self.move_player(dx, dy)
+
+        if moved:
+            # make sure the world around the player is loaded
+            self.level.stream_around(self.player.x, self.player.y)
+
+            # we actually moved, so update status effects and allow
+            # other entities to take their turns
+            with self.profiler.phase("statuses"):
+                self.update_statuses()
+            self.update_noise()
+            # zombies see the player with the player's own field of
+            # view, so it has to be from where they are now
+            self.update_visibility()
+            self.perceive()
+            self.take_turns()
+            self.turns += 1
+
+        self.update_visibility()
+        return moved
\ No newline at end of file
@@ -1,100 +1,154 @@
-import curses
-import random
+import numpy as np
 
-from math_utils import *
 from entity import *
+from utils import *
+from noise import *
+from entity_store import *
+from scheduler import *
+from navigation import *
+from lifecycle import *
+from perception import *
+from worldgen import *
+
+# glyph codes of the tiles that block movement and sight
+solid_codes = np.array([ord(c) for c in solids], dtype=np.uint32)
 
 class Level:
-    def __init__(self, size:tuple[int, int]=(200,100)) -> int:
+    def __init__(self, size:tuple[int, int]=(200,100), seed:int|None=None) -> int:
         self.size: tuple[int, int] = size
-        self.data: list[tuple[str, int]] = [('.', 0) for _ in range(self.size[0] * self.size[1])]
-        self.seen: list[bool] = [False for _ in range(self.size[0] * self.size[1])]
-        self.entities: list[Entity] = []
-
-        for x in range(self.size[0]):
-            for y in range(self.size[1]):
-                dist = distance(x / self.size[0], y / self.size[1], 0.5, 0.5)
-                if dist > 0.45 and pow(random.random(), 2) < (dist - 0.45) * 20:
-                    self.set_at(x, y, 'T', 2)
-
-        self.entities.append(Player(self.size[0] // 2, self.size[1] // 2))
-        
-        def add_building(center):
-            rect = (
-                random.randint(center[0] - 3, center[0] + 3),
-                random.randint(center[1] - 3, center[1] + 3),
-                random.randint(9, 15),
-                random.randint(5, 8)
-            )
-
-            ext_positions: list[tuple[int, int]] = []
-
-            for x in range(rect[0], rect[0] + rect[2] + 1):
-                if x == rect[0] + rect[2] // 3 or x == rect[0] + int(rect[2] * (2 / 3)):
-                    ext_positions.append((x, rect[1]))
-                    ext_positions.append((x, rect[1] + rect[3]))
-                else:
-                    self.set_at(x, rect[1], '#', 0)
-                    self.set_at(x, rect[1] + rect[3], '#', 0)
-            for y in range(rect[1], rect[1] + rect[3] + 1):
-                if y == rect[1] + rect[3] // 3 or y == rect[1] + int(rect[3] * (2 / 3)):
-                    ext_positions.append((rect[0], y))
-                    ext_positions.append((rect[0] + rect[2], y))
-                else:
-                    self.set_at(rect[0], y, '#', 0)
-                    self.set_at(rect[0] + rect[2], y, '#', 0)
-            
-            random.shuffle(ext_positions)
-            for i, pos in enumerate(ext_positions):
-                if i <= 1:
-                    # place 2 doors on the outside of each house
-                    self.entities.append(Door(*pos))
-                elif random.random() < 0.5:
-                    # randomly place windows
-                    self.entities.append(Window(*pos))
-
-                    if random.random() < 0.1:
-                        # 10% chance for the window to be broken
-                        window = self.entities[-1]
-                        window.broken = True
-                        window.char = 'X'
-                        window.solid = False
-                else:
-                    self.set_at(*pos, '#', 0)
-        
-            rx = random.randint(rect[0] + 1, rect[0] + rect[2] - 2)
-            ry = random.randint(rect[1] + 1, rect[1] + rect[3] - 2)
-
-            if self.get_at(rx, ry)[0] == '.':
-                self.entities.append(Corpse(rx, ry))
-
-        building_density = 4
-
-        for i in range(building_density):
-            for j in range(building_density):
-                x = (i + 1) * (self.size[0] // (building_density + 1))
-                y = (j + 1) * (self.size[1] // (building_density + 1))
-
-                add_building((x, y))
+
+        # tile layers, indexed [y, x] like the arrays tcod works with
+        self.chars: np.ndarray = self.make_layer(np.uint32, ord('.'), name="chars")
+        self.colors: np.ndarray = self.make_layer(np.uint8, name="colors")
+        self.seen: np.ndarray = self.make_layer(bool, name="seen")
+        # derived from chars, solid tiles are neither walkable nor transparent
+        self.transparent: np.ndarray = self.make_layer(bool, True, name="transparent")
+        # non-seethrough entities standing on each tile
+        self.blockers: np.ndarray = self.make_layer(np.uint8, name="blockers")
+        # what fov is computed against, tiles and entities combined
+        self.fov_map: np.ndarray = self.make_layer(bool, True, name="fov_map")
+        # extra cost of moving through each tile for pathfinding,
+        # from the doors and windows that would have to be broken
+        self.path_costs: np.ndarray = self.make_layer(np.int32, name="path_costs")
+        # both are kept up to date cell by cell. version is bumped every
+        # time the fov map changes, and path_version every time the
+        # walls or path costs do
+        self.version: int = 0
+        self.path_version: int = 0
+        # (x, y, blocks sight, path cost) of every entity that
+        # contributes to the layers above
+        self.synced: dict[Entity, tuple[int, int, bool, int]] = {}
+
+        self.noise: NoiseField = NoiseField(self.size, self.make_layer(np.int32, name="noise"), self)
+        self.entities: EntityStore = EntityStore(self.size)
+        self.scheduler: Scheduler = Scheduler()
+        self.navigation: Navigation = Navigation(self)
+        self.lifecycle: Lifecycle = Lifecycle(self)
+        self.perception: Perception = Perception(self)
+
+        # how long each stage of generation took, in seconds
+        self.gen_timings: dict[str, float] = self.generate(seed)
+
+    def make_layer(self, dtype, fill=0, name=None) -> np.ndarray:
+        # name is given for the layers that make up the level's state,
+        # see SavedLevel
+        return np.full((self.size[1], self.size[0]), fill, dtype=dtype)
+
+    def generate(self, seed) -> dict[str, float]:
+        return generate(self, seed)
+
+    def close(self) -> None:
+        # for levels holding on to anything outside the process
+        pass
+
+    def stream_around(self, x, y) -> None:
+        # the whole level is always in memory, see ChunkedLevel
+        pass
 
     def get_at(self, x, y) -> tuple[str, int]:
-        return self.data[y * self.size[0] + x]
+        return chr(self.chars[y, x]), int(self.colors[y, x])
 
     def set_at(self, x, y, char, color) -> None:
         if 0 <= x < self.size[0] and 0 <= y < self.size[1]:
-            self.data[y * self.size[0] + x] = (char, color)
-
-    def draw(self, vis, stdscr, ox, oy, cam_x, cam_y, gamesize=(78,22)):
-        for y in range(self.size[1]):
-            for x in range(self.size[0]):
-                if 0 <= y - cam_y < gamesize[1] and 0 <= x - cam_x < gamesize[0]:
-                    if self.seen[y * self.size[0] + x]:
-                        if vis[y * self.size[0] + x]:
-                            char, color = self.get_at(x, y)
-                        else:
-                            # tiles that have been seen, but are not
-                            # actively visible, are drawn in blue
-                            char, color = self.get_at(x, y)[0], 3
-                    else:
-                        char, color = ' ', 0
-                    stdscr.addch(oy + 1 + y - cam_y, ox + 1 + x - cam_x, char, curses.color_pair(color))
\ No newline at end of file
+            self.chars[y, x] = ord(char)
+            self.colors[y, x] = color
+            if self.transparent[y, x] != (char not in solids):
+                self.transparent[y, x] = char not in solids
+                self.version += 1
+                self.path_version += 1
+            self.refresh_cell(x, y)
+
+    def update_transparency(self) -> None:
+        # rebuild the derived masks after writing to chars directly
+        self.transparent[:] = ~np.isin(self.chars, solid_codes)
+        self.fov_map[:] = self.transparent & (self.blockers == 0)
+        self.version += 1
+        self.path_version += 1
+
+    def refresh_cell(self, x, y) -> None:
+        value = self.transparent[y, x] and not self.blockers[y, x]
+        if value != self.fov_map[y, x]:
+            self.fov_map[y, x] = value
+            self.version += 1
+
+    def add_entity(self, entity, delay=None) -> None:
+        self.entities.spawn(entity)
+        self.sync_entity(entity)
+        self.lifecycle.track(entity)
+
+        if delay is None:
+            delay = entity.next_turn_in()
+        if delay is not None:
+            self.scheduler.schedule(entity, delay)
+
+    def remove_entity(self, entity) -> None:
+        entity.marked_for_death = True
+        self.sync_entity(entity)
+        self.entities.despawn(entity)
+
+    def move_entity(self, entity, x, y) -> None:
+        self.entities.move(entity, x, y)
+        self.sync_entity(entity)
+
+    def sync_entity(self, entity) -> None:
+        # call whenever an entity moves, opens, breaks, or is marked for
+        # death so that the fov map and path costs only change where
+        # they have to
+        old = self.synced.get(entity)
+        new = self.sync_state(entity)
+        if old == new:
+            return
+        if old is not None:
+            x, y, blocks, cost = old
+            self.blockers[y, x] -= blocks
+            self.path_costs[y, x] -= cost
+            self.path_version += cost > 0
+            self.refresh_cell(x, y)
+            del self.synced[entity]
+        if new is not None:
+            x, y, blocks, cost = new
+            self.blockers[y, x] += blocks
+            self.path_costs[y, x] += cost
+            self.path_version += cost > 0
+            self.refresh_cell(x, y)
+            self.synced[entity] = new
+
+    def sync_state(self, entity) -> tuple[int, int, bool, int] | None:
+        # what the entity adds to the layers, if anything
+        if entity.marked_for_death:
+            return None
+        blocks = not (entity.seethrough or isinstance(entity, Player))
+        cost = entity.path_cost()
+        if blocks or cost:
+            return entity.x, entity.y, blocks, cost
+        return None
+
+    def render(self, vis, cam_x, cam_y, gamesize=(78,22)) -> tuple[np.ndarray, np.ndarray]:
+        # glyph codes and colors of the tiles on camera
+        view = np.s_[cam_y:cam_y + gamesize[1], cam_x:cam_x + gamesize[0]]
+        seen = self.seen[view]
+        chars = np.where(seen, self.chars[view], ord(' '))
+        # tiles that have been seen, but are not
+        # actively visible, are drawn in blue
+        colors = np.where(seen, np.where(vis[view], self.colors[view], 3), 0)
+        return chars, colors
\ No newline at end of file
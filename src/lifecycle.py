@@ -0,0 +1,58 @@
+import numpy as np
+
+from entity import *
+from utils import *
+
+# corpses getting back up and zombies turning into bloaters, done for all
+# of them at once. each one has the game time it's due at in its deadline
+# column, so finding the ones that are due is one comparison over the
+# column rather than a turn for every corpse and zombie
+class Lifecycle:
+    def __init__(self, level):
+        self.level = level
+
+    def track(self, entity) -> None:
+        # called whenever an entity is added to the level. the clock
+        # starts the first time, and keeps going if it comes back
+        # from a chunk on disk
+        if isinstance(entity, (Corpse, Zombie)) and entity.born < 0:
+            entity.born = self.level.scheduler.time
+            entity.deadline = entity.born + entity.time_to_turn * action_cost
+
+    def due(self, kind, now) -> np.ndarray:
+        # rows of every entity of a kind whose deadline has passed.
+        # a deadline of -1 means there is nothing left to happen
+        store = self.level.entities
+        rows = store.select(kind)
+        if not len(rows):
+            return rows
+        deadline = store.columns["deadline"][rows]
+        return rows[(deadline >= 0) & (deadline <= now)]
+
+    def update(self) -> int:
+        # returns how many corpses got back up
+        level = self.level
+        store = level.entities
+        now = level.scheduler.time
+
+        rows = self.due(Zombie, now)
+        if len(rows):
+            store.columns["is_bloater"][rows] = True
+            store.columns["deadline"][rows] = -1
+            for row in rows:
+                store.rows[row].char = 'B'
+
+        corpses = [store.rows[row] for row in self.due(Corpse, now)]
+        for corpse in corpses:
+            level.remove_entity(corpse)
+        for corpse in corpses:
+            level.add_entity(Zombie(corpse.x, corpse.y))
+
+        return len(corpses)
+
+    def kill(self, entity) -> None:
+        # removes something that died, leaving behind what it leaves behind
+        self.level.remove_entity(entity)
+        if isinstance(entity, Zombie) and not entity.is_bloater:
+            # felled zombies leave a corpse, which gets back up in time
+            self.level.add_entity(Corpse(entity.x, entity.y))
\ No newline at end of file
@@ -0,0 +1,92 @@
+from collections import deque
+from functools import lru_cache
+
+text_colors: dict[str, int] = {
+    'w': 0,
+    'r': 1,
+    'g': 2,
+    'b': 3,
+    'y': 4,
+    'c': 5,
+    'm': 6,
+}
+
+# a line of text split into (text, color) runs, ready to be drawn with
+# one addstr per run
+Line = tuple[tuple[str, int], ...]
+
+@lru_cache(maxsize=256)
+def compile_text(text, color=0) -> tuple[Line, ...]:
+    # parses the backtick color markup, `rlike this` for red text. a
+    # backtick in the default color starts a color code, the letter right
+    # after it, and any other backtick goes back to the default color
+    lines = []
+    runs = []
+    run = []
+    c = color
+    cont = True
+
+    def flush():
+        if run:
+            runs.append(("".join(run), c))
+            run.clear()
+
+    for char in text:
+        if char == '`':
+            if c == color:
+                cont = False
+            flush()
+            c = color
+            continue
+        if cont:
+            if char == '\n':
+                flush()
+                lines.append(tuple(runs))
+                runs = []
+                continue
+            run.append(char)
+        else:
+            c = text_colors.get(char, 0)
+            cont = True
+
+    flush()
+    lines.append(tuple(runs))
+    return tuple(lines)
+
+class MessageLog:
+    # the most recent messages, each parsed once when it's added. older
+    # ones can be scrolled back to until they fall off the end of history
+    def __init__(self, visible=5, messages=(), history=200):
+        self.visible: int = visible
+        self.entries: deque[tuple[str, Line]] = deque(maxlen=history)
+        # how many messages back from the newest the view is scrolled
+        self.scroll: int = 0
+        # bumped whenever what's in view changes
+        self.version: int = 0
+
+        for text in messages:
+            self.add(text)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self):
+        # the text of every message, oldest first
+        return (text for text, _ in self.entries)
+
+    def add(self, text) -> None:
+        # only the first line of a message is shown
+        self.entries.append((text, compile_text(text)[0]))
+        self.scroll = 0
+        self.version += 1
+
+    def scroll_by(self, n) -> None:
+        scroll = min(max(0, self.scroll + n), max(0, len(self.entries) - self.visible))
+        if scroll != self.scroll:
+            self.scroll = scroll
+            self.version += 1
+
+    def view(self) -> list[Line]:
+        end = len(self.entries) - self.scroll
+        start = max(0, end - self.visible)
+        return [self.entries[i][1] for i in range(start, end)]
\ No newline at end of file
@@ -0,0 +1,88 @@
+import numpy as np
+import tcod.path
+
+# how far from the player the dijkstra maps reach, in tiles. nothing
+# further away than this can sense or hear the player anyway
+nav_radius: int = 40
+
+# what DijkstraMap.at returns for tiles that can't be reached
+unreachable: int = np.iinfo(np.int32).max
+
+class DijkstraMap:
+    # distances over a window of the level starting at (x0, y0)
+    def __init__(self, dist, x0, y0):
+        self.dist: np.ndarray = dist
+        self.x0: int = x0
+        self.y0: int = y0
+
+    def at(self, x, y) -> int:
+        i, j = x - self.x0, y - self.y0
+        if 0 <= j < self.dist.shape[0] and 0 <= i < self.dist.shape[1]:
+            return int(self.dist[j, i])
+        return unreachable
+
+    def step(self, x, y) -> tuple[int, int] | None:
+        # the direction that goes downhill the fastest, or None if
+        # there is nowhere lower to go
+        best = None
+        best_dist = self.at(x, y)
+        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
+            dist = self.at(x + dx, y + dy)
+            if dist < best_dist:
+                best, best_dist = (dx, dy), dist
+        return best
+
+def nav_window(size, x, y) -> tuple[int, int, int, int]:
+    # (x0, y0, x1, y1) of the square of nav_radius around (x, y)
+    return max(0, x - nav_radius), max(0, y - nav_radius), min(size[0], x + nav_radius + 1), min(size[1], y + nav_radius + 1)
+
+# dijkstra maps shared by every zombie on the level. each one is only
+# rebuilt when its goals or the level's walls and obstacles change, and
+# moving along one is a lookup of the four neighbouring tiles.
+class Navigation:
+    def __init__(self, level):
+        self.level = level
+
+        self.player_map: DijkstraMap | None = None
+        self.player_key = None
+
+        self.noise_map: DijkstraMap | None = None
+        self.noise_key = None
+
+    def window(self, player):
+        x0, y0, x1, y1 = nav_window(self.level.size, player.x, player.y)
+        return x0, y0, np.s_[y0:y1, x0:x1]
+
+    def costs(self, window) -> np.ndarray:
+        # 0 means impassable, otherwise the price of stepping onto the
+        # tile. doors and windows cost extra since they have to be
+        # broken before anything can walk through them
+        return np.where(self.level.transparent[window], 1 + self.level.path_costs[window], 0).astype(np.int32)
+
+    def toward_player(self, player) -> DijkstraMap:
+        key = (player.x, player.y, self.level.path_version)
+        if key != self.player_key:
+            x0, y0, window = self.window(player)
+            cost = self.costs(window)
+            dist = tcod.path.maxarray(cost.shape, dtype=np.int32)
+            dist[player.y - y0, player.x - x0] = 0
+            tcod.path.dijkstra2d(dist, cost, 1, None, out=dist)
+            self.player_map, self.player_key = DijkstraMap(dist, x0, y0), key
+        return self.player_map
+
+    def toward_noise(self, player) -> DijkstraMap:
+        noise = self.level.noise
+        key = (player.x, player.y, noise.version, self.level.path_version)
+        if key != self.noise_key:
+            x0, y0, window = self.window(player)
+            cost = self.costs(window)
+            grid = noise.grid[window]
+            dist = tcod.path.maxarray(cost.shape, dtype=np.int32)
+            # louder tiles start out closer, so a horde picks
+            # the loudest sound it can reach over the nearest
+            loud = grid > 0
+            if loud.any():
+                dist[loud] = grid.max() - grid[loud]
+                tcod.path.dijkstra2d(dist, cost, 1, None, out=dist)
+            self.noise_map, self.noise_key = DijkstraMap(dist, x0, y0), key
+        return self.noise_map
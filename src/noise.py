@@ -0,0 +1,132 @@
+import numpy as np
+import tcod.path
+
+from collections import OrderedDict
+from functools import lru_cache
+
+# what it takes for sound to cross a tile, open ground being 1. walls and
+# trees soak up most of it. a closed door or unbroken window adds half its
+# path cost to the tile it's in, so doors muffle more than windows, and
+# broken windows and open doors let everything through
+wall_sound_cost: int = 10
+
+# the same sound made from the same tile of an unchanged level spreads
+# the same way, so the stamps of the last few are kept
+stamp_cache_size: int = 64
+
+@lru_cache(maxsize=None)
+def noise_kernel(radius: int, intensity: int) -> np.ndarray:
+    # how loud a sound is at every offset from where it was made,
+    # as a (2r+1, 2r+1) stamp centered on the source
+    offsets = np.arange(-radius, radius + 1)
+    dist = np.hypot(offsets[None, :], offsets[:, None])
+    kernel = np.where(dist <= radius, np.round((1 - dist / radius) * intensity), 0).astype(np.int32)
+    # shared between every caller, so it must never be written to
+    kernel.flags.writeable = False
+    return kernel
+
+def sound_costs(transparent, path_costs) -> np.ndarray:
+    return np.where(transparent, 1 + path_costs // 2, wall_sound_cost).astype(np.int32)
+
+def sound_distances(costs, i, j) -> np.ndarray:
+    # how far sound made at (i, j) travels to reach every tile, in half
+    # tiles. 2 per straight step and 3 per diagonal one makes a rough
+    # circle out of open ground
+    dist = tcod.path.maxarray(costs.shape, dtype=np.int32)
+    dist[j, i] = 0
+    tcod.path.dijkstra2d(dist, costs, 2, 3, out=dist)
+    return dist
+
+class NoiseField:
+    def __init__(self, size: tuple[int, int], grid: np.ndarray | None = None, level=None):
+        self.size: tuple[int, int] = size
+        self.grid: np.ndarray = np.zeros((size[1], size[0]), dtype=np.int32) if grid is None else grid
+        # bumped every time the grid changes
+        self.version: int = 0
+
+        # the level sound travels through. without one it
+        # spreads in a plain circle, walls or not
+        self.level = level
+        # (x, y, radius, intensity, path version) -> (x0, y0, stamp),
+        # least recently used first
+        self.stamps: OrderedDict[tuple[int, int, int, int, int], tuple[int, int, np.ndarray]] = OrderedDict()
+
+    def at(self, x, y) -> int:
+        return int(self.grid[y, x])
+
+    def gather(self, xs, ys) -> np.ndarray:
+        # at for a lot of tiles at once. a chunked grid can't be indexed
+        # with arrays, so only the rectangle around the tiles is read
+        if isinstance(self.grid, np.ndarray):
+            return self.grid[ys, xs]
+        if not len(xs):
+            return np.zeros(0, dtype=np.int32)
+        x0, y0 = int(xs.min()), int(ys.min())
+        grid = self.grid[y0:int(ys.max()) + 1, x0:int(xs.max()) + 1]
+        return grid[ys - y0, xs - x0]
+
+    def decay(self, amount=1) -> None:
+        # every value decreases by amount, but never drops below zero.
+        # a chunked grid is decayed one loaded chunk at a time
+        blocks = self.grid.blocks() if hasattr(self.grid, "blocks") else [self.grid]
+        for block in blocks:
+            np.subtract(block, amount, out=block)
+            np.maximum(block, 0, out=block)
+        self.version += 1
+
+    def stamp(self, x, y, radius, intensity) -> tuple[int, int, np.ndarray]:
+        # how loud a sound is on every tile around where it was made, as
+        # a stamp with its top left corner at (x0, y0)
+        level = self.level
+        if level is None:
+            return x - radius, y - radius, noise_kernel(radius, intensity)
+
+        key = x, y, radius, intensity, level.path_version
+        stamp = self.stamps.get(key)
+        if stamp is not None:
+            self.stamps.move_to_end(key)
+            return stamp
+
+        # sound can't get further than the radius, so only the
+        # square around the source is looked at
+        x0, y0 = max(0, x - radius), max(0, y - radius)
+        x1, y1 = min(self.size[0], x + radius + 1), min(self.size[1], y + radius + 1)
+        window = np.s_[y0:y1, x0:x1]
+        dist = sound_distances(sound_costs(level.transparent[window], level.path_costs[window]), x - x0, y - y0)
+        kernel = np.where(dist <= 2 * radius, np.round((1 - dist / (2 * radius)) * intensity), 0).astype(np.int32)
+        kernel.flags.writeable = False
+
+        stamp = self.stamps[key] = x0, y0, kernel
+        if len(self.stamps) > stamp_cache_size:
+            self.stamps.popitem(last=False)
+        return stamp
+
+    def emit(self, x, y, radius, intensity=1) -> None:
+        if radius <= 0:
+            return
+
+        x0, y0, kernel = self.stamp(x, y, radius, intensity)
+
+        # clip the stamp against the edges of the map
+        gx0, gy0 = max(0, x0), max(0, y0)
+        gx1, gy1 = min(self.size[0], x0 + kernel.shape[1]), min(self.size[1], y0 + kernel.shape[0])
+        if gx0 >= gx1 or gy0 >= gy1:
+            return
+
+        self.grid[gy0:gy1, gx0:gx1] += kernel[gy0 - y0:gy1 - y0, gx0 - x0:gx1 - x0]
+        self.version += 1
+
+    def loudest_near(self, x, y, radius) -> tuple[int, int, int] | None:
+        # the loudest tile in the square of the given radius around
+        # (x, y), or None if it is completely quiet
+        gx0, gy0 = max(0, x - radius), max(0, y - radius)
+        gx1, gy1 = min(self.size[0], x + radius + 1), min(self.size[1], y + radius + 1)
+        window = self.grid[gy0:gy1, gx0:gx1]
+        if window.size == 0:
+            return None
+
+        j, i = np.unravel_index(np.argmax(window), window.shape)
+        value = int(window[j, i])
+        if value == 0:
+            return None
+        return gx0 + int(i), gy0 + int(j), value
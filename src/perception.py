@@ -0,0 +1,56 @@
+import numpy as np
+
+from entity import *
+from navigation import *
+
+def in_view(xs, ys, visible, window) -> np.ndarray:
+    # whether each of the tiles is visible, where visible is what the
+    # player can see of the level inside window
+    x0, y0 = window[1].start, window[0].start
+    i, j = xs - x0, ys - y0
+    inside = (i >= 0) & (i < visible.shape[1]) & (j >= 0) & (j < visible.shape[0])
+    out = np.zeros(len(xs), dtype=bool)
+    out[inside] = visible[j[inside], i[inside]]
+    return out
+
+# what every zombie can see and hear, worked out once a turn for all of
+# them at once rather than by each zombie on its own turn. sight is the
+# player's field of view the other way around: fov is symmetric, so a
+# zombie on a tile the player can see can see the player, and only has
+# to be close enough. hearing is how loud the noise is at every
+# zombie's tile, read in one go. neither costs more than a few gathers
+# as the horde grows
+class Perception:
+    def __init__(self, level):
+        self.level = level
+
+    def update(self, player, visible, window) -> int:
+        # visible is what the player can see of the level inside window.
+        # sets every zombie's sees_player and hears_player, and returns
+        # how many of them perceive the player one way or the other
+        store = self.level.entities
+        rows = store.select(Zombie)
+        if not len(rows):
+            return 0
+
+        columns = store.columns
+        xs, ys = columns["x"][rows].astype(np.int64), columns["y"][rows].astype(np.int64)
+
+        sees = in_view(xs, ys, visible, window)
+        sense = columns["sense_radius"][rows].astype(np.int64)
+        sees &= (xs - player.x) ** 2 + (ys - player.y) ** 2 <= sense ** 2
+
+        # a zombie hears the player if the noise has reached its own
+        # tile, however faintly. walls and doors soaked the noise up as
+        # it spread, so one behind a locked door hears nothing. it is
+        # only read near the player, since the map a zombie follows to
+        # the noise doesn't reach any further
+        hears = np.zeros(len(rows), dtype=bool)
+        nx0, ny0, nx1, ny1 = nav_window(self.level.size, player.x, player.y)
+        listening = ~sees & (xs >= nx0) & (xs < nx1) & (ys >= ny0) & (ys < ny1)
+        if listening.any():
+            hears[listening] = self.level.noise.gather(xs[listening], ys[listening]) > 0
+
+        columns["sees_player"][rows] = sees
+        columns["hears_player"][rows] = hears
+        return int(np.count_nonzero(sees | hears))
\ No newline at end of file
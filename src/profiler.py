@@ -0,0 +1,127 @@
+import json
+import os
+import time
+import numpy as np
+
+from collections import deque
+
+# how many of the most recent samples percentiles are taken over
+sample_window: int = 256
+
+class PhaseTimer:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name: str = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+
+class NullPhase:
+    # what phase hands out while profiling is off, so an instrumented
+    # block costs one method call and an empty with statement
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+null_phase = NullPhase()
+
+class Profiler:
+    # times phases of a turn or frame and keeps counters, for the overlay
+    # and optionally a trace file that chrome://tracing or perfetto can open
+    def __init__(self, enabled=False):
+        self.enabled: bool = enabled
+
+        # the most recent durations of each phase, in seconds
+        self.samples: dict[str, deque[float]] = {}
+        # total seconds spent in each phase
+        self.totals: dict[str, float] = {}
+        # the last value and the total of each counter
+        self.counts: dict[str, int] = {}
+        self.count_totals: dict[str, int] = {}
+
+        self.origin: float = time.perf_counter()
+        self.trace_file = None
+
+    def phase(self, name):
+        if not self.enabled:
+            return null_phase
+        return PhaseTimer(self, name)
+
+    def record(self, name, start, end) -> None:
+        duration = end - start
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=sample_window)
+        samples.append(duration)
+        self.totals[name] = self.totals.get(name, 0.0) + duration
+
+        if self.trace_file is not None:
+            self.trace({"name": name, "ph": "X", "ts": self.micros(start), "dur": duration * 1e6})
+
+    def count(self, name, n=1) -> None:
+        if not self.enabled:
+            return
+        self.counts[name] = n
+        self.count_totals[name] = self.count_totals.get(name, 0) + n
+
+        if self.trace_file is not None:
+            self.trace({"name": name, "ph": "C", "ts": self.micros(time.perf_counter()), "args": {name: n}})
+
+    def percentiles(self, name, qs=(50, 95, 99)) -> list[float]:
+        samples = self.samples.get(name)
+        if not samples:
+            return [0.0] * len(qs)
+        return [float(p) for p in np.percentile(samples, qs)]
+
+    def reset(self) -> None:
+        self.samples.clear()
+        self.totals.clear()
+        self.counts.clear()
+        self.count_totals.clear()
+
+    def overlay(self, width) -> list[str]:
+        # lines of text for the backpack panel, the median and 95th
+        # percentile of every phase in milliseconds, then the counters
+        lines = [f"{'ms':<{width - 12}} {'p50':>5} {'p95':>5}"]
+        for name in self.samples:
+            p50, p95 = self.percentiles(name, (50, 95))
+            lines.append(f"{name[:width - 12]:<{width - 12}} {p50 * 1000:>5.2f} {p95 * 1000:>5.2f}")
+        lines.append("")
+        for name, n in self.counts.items():
+            lines.append(f"{name[:width - 7]:<{width - 7}} {n:>6}")
+        return lines
+
+    def micros(self, t) -> float:
+        return (t - self.origin) * 1e6
+
+    def open_trace(self, path) -> None:
+        # events are written as they happen, in the json array format
+        # which can be read back without the closing bracket, so a trace
+        # cut short by a crash is still usable
+        self.trace_file = open(path, "w")
+        self.trace_file.write("[")
+        self.trace_pid: int = os.getpid()
+        self.trace_separator: str = "\n"
+        self.trace({"name": "process_name", "ph": "M", "args": {"name": "hivemind"}})
+
+    def trace(self, event) -> None:
+        event["pid"] = self.trace_pid
+        event["tid"] = 0
+        self.trace_file.write(self.trace_separator + json.dumps(event))
+        self.trace_separator = ",\n"
+
+    def close_trace(self) -> None:
+        if self.trace_file is None:
+            return
+        self.trace_file.write("\n]\n")
+        self.trace_file.close()
+        self.trace_file = None
\ No newline at end of file
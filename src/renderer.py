@@ -0,0 +1,226 @@
+import curses
+import numpy as np
+
+from entity import *
+from level import *
+from math_utils import *
+from profiler import *
+from markup import *
+from framebuffer import *
+
+def compose_frame(level, vis, player, cam_x, cam_y, game_size, invert=False) -> tuple[np.ndarray, np.ndarray]:
+    # glyph codes and colors of everything on camera, tiles and entities
+    chars, colors = level.render(vis, cam_x, cam_y, game_size)
+    if chars.shape != (game_size[1], game_size[0]):
+        # a level smaller than the view is padded out with blank tiles
+        pad = ((0, game_size[1] - chars.shape[0]), (0, game_size[0] - chars.shape[1]))
+        chars, colors = np.pad(chars, pad, constant_values=ord(' ')), np.pad(colors, pad)
+
+    for entity in level.entities.in_rect(cam_x, cam_y, cam_x + game_size[0], cam_y + game_size[1]):
+        x, y = entity.x - cam_x, entity.y - cam_y
+        if entity is not player:
+            char, colors[y, x] = entity.glyph(level, vis)
+            chars[y, x] = ord(char)
+
+    # the player is drawn last so nothing can cover it up
+    char, color = player.glyph(level, vis, invert)
+    chars[player.y - cam_y, player.x - cam_x] = ord(char)
+    colors[player.y - cam_y, player.x - cam_x] = color
+
+    return chars, colors
+
+def camera(level, player, game_size) -> tuple[int, int]:
+    # the top left corner of the view, centered on the player as far as
+    # the edges of the level allow. a level smaller than the view is
+    # shown from its top left corner
+    cam_x = clamp(player.x - game_size[0] // 2, 0, max(0, level.size[0] - game_size[0]))
+    cam_y = clamp(player.y - game_size[1] // 2, 0, max(0, level.size[1] - game_size[1]))
+    return cam_x, cam_y
+
+game_name: str = "Hivemind"
+
+# the whole screen, and the part of it the level is shown in
+screen_size: tuple[int, int] = (80, 30)
+game_size: tuple[int, int] = (58, 22)
+
+def percentage_to_color(v: float) -> str:
+    if v < 0.4:
+        return 'r'
+    elif v < 0.7:
+        return 'y'
+    return 'g'
+
+def stats_text(player) -> str:
+    # the player's stats panel, in color markup
+    health_color = percentage_to_color(player.health / player.max_health)
+    food_color = percentage_to_color(player.food / player.max_food)
+    water_color = percentage_to_color(player.water / player.max_water)
+    stats = [
+        f"  `rHp`: `{health_color}{str(player.health).rjust(2, '0')}`/`g{player.max_health}` x `yFd`: `{food_color}{str(player.food).rjust(2, '0')}`/`g{player.max_food}` x `bWt`: `{water_color}{str(player.water).rjust(2, '0')}`/`g{player.max_water}`",
+        f"  `cVsn`: `{percentage_to_color(player.sight_radius / 10)}{player.sight_radius}`    x `mNse`: `{percentage_to_color((10 - player.noise) / 10)}{player.noise}`",
+        ""
+    ]
+
+    t = "  "
+    for i, p_status in enumerate(player.statuses):
+        t += {
+            StatusEffect.Bleeding: "`rBleeding`",
+            StatusEffect.Dehydrated: "`cDehydrated`",
+            StatusEffect.Exhausted: "`mExhausted`",
+            StatusEffect.Infected: "`gInfected`",
+            StatusEffect.Starving: "`yStarving`",
+        }[p_status] + "   "
+        if i % 3 == 2:
+            stats.append(t)
+            t = "  "
+    if len(t) > 2:
+        stats.append(t)
+
+    return "\n".join(stats)
+
+# the whole screen, game, panels and the lines between them, drawn into a
+# Framebuffer. this is everything the curses front end shows, without
+# curses, so replays and tests can look at frames without a terminal
+class Compositor:
+    def __init__(self, screen_size=screen_size, game_size=game_size, title=game_name, profiler=None):
+        self.profiler: Profiler = Profiler() if profiler is None else profiler
+        self.screen_size = screen_size
+        self.game_size = game_size
+        self.title = title
+        self.screen: Framebuffer = Framebuffer(screen_size)
+
+        # (x, y, width, height) of every part of the screen
+        ui_height = screen_size[1] - game_size[1] - 3
+        mid = screen_size[0] // 2
+        self.game_box = (1, 1, game_size[0], game_size[1])
+        self.stats_box = (1, game_size[1] + 2, mid - 2, ui_height)
+        self.messages_box = (mid, game_size[1] + 2, screen_size[0] - mid - 1, ui_height)
+        self.backpack_box = (game_size[0] + 2, 1, screen_size[0] - game_size[0] - 3, game_size[1])
+
+        self.stats_text = None
+        self.messages_text = None
+        self.backpack_text = None
+
+        self.draw_chrome()
+
+    def draw_chrome(self):
+        screen = self.screen
+        screen_size, game_size = self.screen_size, self.game_size
+        w, h = screen_size
+
+        screen.fill(0, 0, w, h)
+
+        # box around the game
+        screen.fill(0, 0, 1, h, '|')
+        screen.fill(w - 1, 0, 1, h, '|')
+        screen.fill(0, 0, w, 1, '-')
+        screen.fill(0, h - 1, w, 1, '-')
+        for x, y in [(0, 0), (w - 1, 0), (0, h - 1), (w - 1, h - 1)]:
+            screen.put(x, y, '+')
+        # game title
+        screen.text(2, 0, compile_text(self.title))
+
+        # line splitting the UI from the game
+        screen.fill(1, game_size[1] + 1, w - 2, 1, '-')
+
+        # UI mid-way line
+        screen.fill(w // 2 - 1, game_size[1] + 1, 1, h - game_size[1] - 1, '|')
+        screen.put(w // 2 - 1, game_size[1] + 1, '+')
+        screen.put(w // 2 - 1, h - 1, '+')
+        # backpack seperator line
+        screen.fill(game_size[0] + 1, 0, 1, game_size[1] + 2, '|')
+        screen.put(game_size[0] + 1, 0, '+')
+        screen.put(game_size[0] + 1, game_size[1] + 1, '+')
+
+        # stats text
+        screen.text(2, game_size[1] + 1, compile_text("Stats"))
+        # messages text
+        screen.text(w // 2 + 1, game_size[1] + 1, compile_text("Messages"))
+        # backpack text
+        screen.text(game_size[0] + 3, 0, compile_text("Backpack"))
+
+        # force everything on top of the chrome to be drawn again
+        self.stats_text = self.messages_text = self.backpack_text = None
+
+    def draw_game(self, level, vis, player, cam_x, cam_y, invert=False):
+        with self.profiler.phase("compose"):
+            chars, colors = compose_frame(level, vis, player, cam_x, cam_y, self.game_size, invert)
+            self.screen.blit(self.game_box[0], self.game_box[1], chars, colors)
+
+    def draw_frame(self, game, cam_x, cam_y, invert=False, backpack=()):
+        # everything that can change from one frame to the next
+        self.draw_game(game.level, game.active_visibility, game.player, cam_x, cam_y, invert)
+        self.draw_stats(stats_text(game.player))
+        self.draw_messages(game.messages)
+        self.draw_backpack(backpack)
+
+    def draw_text(self, box, lines, key, old_key):
+        # redraws a box full of compiled text if its key changed
+        if key != old_key:
+            with self.profiler.phase("text"):
+                self.screen.fill(*box)
+                self.screen.text(box[0], box[1], lines, box[2], box[3])
+        return key
+
+    def draw_stats(self, text):
+        self.stats_text = self.draw_text(self.stats_box, compile_text(text), text, self.stats_text)
+
+    def draw_messages(self, log):
+        self.messages_text = self.draw_text(self.messages_box, log.view(), (id(log), log.version), self.messages_text)
+
+    def draw_backpack(self, lines):
+        text = "\n".join(lines)
+        self.backpack_text = self.draw_text(self.backpack_box, compile_text(text), text, self.backpack_text)
+
+    def dump(self) -> str:
+        return self.screen.dump()
+
+# a Compositor that puts its frames on a terminal, centered on it
+class Renderer(Compositor):
+    def __init__(self, stdscr, screen_size=screen_size, game_size=game_size, title=game_name, profiler=None):
+        self.stdscr = stdscr
+
+        h, w = stdscr.getmaxyx()
+        self.oy, self.ox = h // 2 - screen_size[1] // 2, w // 2 - screen_size[0] // 2
+
+        # what is currently on the terminal, None if it isn't known
+        self.shown: Framebuffer | None = None
+
+        super().__init__(screen_size, game_size, title, profiler)
+
+    def draw_chrome(self):
+        super().draw_chrome()
+        self.stdscr.erase()
+        self.shown = None
+
+    def game_tile(self, x, y) -> tuple[int, int] | None:
+        # where a cell of the terminal is in the game view, if it is in it
+        gx, gy, w, h = self.game_box
+        x, y = x - self.ox - gx, y - self.oy - gy
+        if 0 <= x < w and 0 <= y < h:
+            return x, y
+        return None
+
+    def present(self):
+        screen = self.screen
+        with self.profiler.phase("present"):
+            # only the runs covering cells that changed since the last frame
+            if self.shown is None:
+                self.shown = Framebuffer(self.screen_size)
+                changed = np.ones(screen.chars.shape, dtype=bool)
+            else:
+                changed = (screen.chars != self.shown.chars) | (screen.colors != self.shown.colors)
+            runs = screen.runs(changed)
+            for x, y, text, color in runs:
+                try:
+                    self.stdscr.addstr(self.oy + y, self.ox + x, text, curses.color_pair(color))
+                except curses.error:
+                    # writing the bottom right cell moves the cursor off
+                    # the screen, but the text still gets drawn
+                    pass
+            self.shown.chars[:] = screen.chars
+            self.shown.colors[:] = screen.colors
+            self.stdscr.noutrefresh()
+            curses.doupdate()
+        self.profiler.count("cells changed", int(np.count_nonzero(changed)))
+        self.profiler.count("runs drawn", len(runs))
\ No newline at end of file
@@ -0,0 +1,123 @@
+import json
+import sys
+import time
+
+from rng import *
+from level import *
+from save import *
+from game import *
+from profiler import *
+
+# bumped whenever the layout of a replay changes
+replay_format: int = 1
+
+# one character per input, lower case to move and upper case to attack
+input_codes: dict[tuple[int, int], str] = {(0, -1): "u", (0, 1): "d", (-1, 0): "l", (1, 0): "r"}
+input_steps: dict[str, tuple[int, int, str]] = {}
+for (dx, dy), code in input_codes.items():
+    input_steps[code] = dx, dy, "move"
+    input_steps[code.upper()] = dx, dy, "attack"
+
+# the game's fingerprint is kept every this many inputs, so a replay that
+# stops matching can be narrowed down to where it went wrong
+checkpoint_interval: int = 50
+
+class Recorder:
+    # everything needed to play a game again from the start: the seed,
+    # what kind of level it was, and every input
+    def __init__(self, seed, size, chunked=False):
+        self.seed: int = seed
+        self.size: tuple[int, int] = size
+        self.chunked: bool = chunked
+        self.inputs: list[str] = []
+        # number of inputs -> fingerprint after that many
+        self.checkpoints: dict[int, str] = {}
+
+    def record(self, game, dx, dy, action) -> None:
+        code = input_codes[dx, dy]
+        self.inputs.append(code.upper() if action == "attack" else code)
+        if len(self.inputs) % checkpoint_interval == 0:
+            self.checkpoints[len(self.inputs)] = game.fingerprint()
+
+    def save(self, path) -> None:
+        with open(path, "w") as f:
+            json.dump({
+                "format": replay_format,
+                "seed": self.seed,
+                "size": list(self.size),
+                "chunked": self.chunked,
+                "inputs": "".join(self.inputs),
+                "checkpoints": self.checkpoints,
+            }, f)
+
+def load_replay(path) -> dict:
+    with open(path) as f:
+        replay = json.load(f)
+    if replay["format"] != replay_format:
+        raise ValueError(f"{path} is from an incompatible version of the game")
+    replay["checkpoints"] = {int(n): fingerprint for n, fingerprint in replay["checkpoints"].items()}
+    return replay
+
+def new_game(seed, size, chunked=False, profiler=None) -> Game:
+    # the game a replay starts from. the streams have to be seeded
+    # before the level, since generating it already rolls them
+    streams.seed(seed)
+    if chunked:
+        # only imported when needed, to keep startup fast
+        from world import ChunkedLevel
+        level = ChunkedLevel(size, seed)
+    else:
+        level = cached_level(size, seed)
+    game = Game(level, profiler=profiler)
+    game.start()
+    return game
+
+def play_replay(replay, game) -> int | None:
+    # runs every input of a replay on a game made by new_game. returns
+    # the checkpoint where it stopped matching, or None if it never did
+    for n, code in enumerate(replay["inputs"], 1):
+        game.step(*input_steps[code])
+        expected = replay["checkpoints"].get(n)
+        if expected is not None and game.fingerprint() != expected:
+            return n
+    return None
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Play a recorded game again without a terminal.")
+    parser.add_argument("path", help="a replay recorded with main.py --record")
+    parser.add_argument("--profile", action="store_true", help="show where the time went")
+    parser.add_argument("--screen", action="store_true", help="show what the screen looked like at the end")
+    args = parser.parse_args()
+
+    replay = load_replay(args.path)
+    profiler = Profiler(args.profile)
+    game = new_game(replay["seed"], tuple(replay["size"]), replay["chunked"], profiler)
+
+    start = time.perf_counter()
+    desync = play_replay(replay, game)
+    elapsed = time.perf_counter() - start
+
+    inputs = len(replay["inputs"]) if desync is None else desync
+    print(f"{inputs} inputs, {game.turns} turns in {elapsed:.3f}s, {inputs / max(elapsed, 1e-9):.0f} inputs/sec")
+    if args.profile:
+        for line in profiler.overlay(60):
+            print(line)
+
+    if args.screen:
+        # only imported when asked for, it brings curses with it
+        from renderer import Compositor, camera
+        compositor = Compositor()
+        cam_x, cam_y = camera(game.level, game.player, compositor.game_size)
+        compositor.draw_frame(game, cam_x, cam_y)
+        print(compositor.dump())
+
+    if desync is not None:
+        print(f"desync: the game stopped matching the recording between inputs {desync - checkpoint_interval} and {desync}")
+        return 1
+    print("matched the recording")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
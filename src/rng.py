@@ -0,0 +1,39 @@
+import random
+
+# every part of the game that rolls dice has its own stream, all seeded
+# from one number. the same seed and the same inputs always play out the
+# same way, and a change to how often one part rolls doesn't shift the
+# rolls of all the others
+stream_names: list[str] = ["worldgen", "combat", "ai", "status"]
+
+def new_seed() -> int:
+    # not from numpy, which would import numpy.random on startup
+    return random.SystemRandom().getrandbits(63)
+
+class Streams:
+    def __init__(self, seed:int|None=None):
+        self.seed(seed)
+
+    def seed(self, seed:int|None=None) -> int:
+        # returns the seed, which is made up if none is given
+        self.initial_seed: int = new_seed() if seed is None else seed
+        # default entity stats the generator doesn't pick itself
+        self.worldgen: random.Random = random.Random(f"{self.initial_seed}/worldgen")
+        # damage dealt and taken
+        self.combat: random.Random = random.Random(f"{self.initial_seed}/combat")
+        # zombies and corpses
+        self.ai: random.Random = random.Random(f"{self.initial_seed}/ai")
+        # the player's status effects
+        self.status: random.Random = random.Random(f"{self.initial_seed}/status")
+        return self.initial_seed
+
+    def getstate(self) -> dict:
+        return {name: getattr(self, name).getstate() for name in stream_names}
+
+    def setstate(self, state) -> None:
+        # state may have been through json, which turns tuples into lists
+        for name, (version, internal, gauss) in state.items():
+            getattr(self, name).setstate((version, tuple(internal), gauss))
+
+# the streams everything rolls with
+streams: Streams = Streams()
\ No newline at end of file
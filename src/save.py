@@ -0,0 +1,259 @@
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+from entity import *
+from level import *
+from rng import *
+from worldgen import *
+
+# where the game is saved to and loaded from
+default_save_path: str = "hivemind.save"
+
+# bumped whenever the layout of a save changes
+save_format: int = 6
+
+# levels smaller than this many tiles generate faster than they load,
+# so they aren't cached
+cache_min_tiles: int = 250_000
+
+# where generated levels are cached, see cached_level
+default_cache_dir: str = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "hivemind")
+
+# the most the cached levels take up on disk, in bytes. the ones used
+# least recently go first. a 1000x1000 level is about 16.5MiB
+cache_max_bytes: int = 256 * 2**20
+
+# every layer that makes up the state of a level. the rest are
+# recreated from these
+saved_layers: list[str] = ["chars", "colors", "seen", "transparent", "blockers", "fov_map", "path_costs", "noise"]
+
+entity_kinds: dict[str, type] = {kind.__name__: kind for kind in [Player, Door, Window, Corpse, Zombie]}
+
+# one row per entity. an entity only has some of these, the ones it has
+# are listed per kind in the save's meta data
+entity_columns: list[tuple[str, type]] = [
+    ("kind", np.uint8),
+    ("x", np.int32),
+    ("y", np.int32),
+    ("health", np.int16),
+    ("max_health", np.int16),
+    # indices into the save's string table
+    ("name", np.uint16),
+    ("description", np.uint16),
+    ("char", "U1"),
+    ("color", np.uint8),
+    ("solid", bool),
+    ("seethrough", bool),
+    ("detectable", bool),
+    ("marked_for_death", bool),
+    ("speed", np.int16),
+    # -1 if the entity isn't queued, otherwise its place in the scheduler
+    ("next_turn", np.int64),
+    ("turn_order", np.int64),
+    # doors and windows
+    ("open", bool),
+    ("broken", bool),
+    ("locked", bool),
+    # corpses and zombies
+    ("born", np.int64),
+    ("deadline", np.int64),
+    ("time_to_turn", np.int32),
+    ("is_bloater", bool),
+    ("sense_radius", np.int16),
+    ("sees_player", bool),
+    ("hears_player", bool),
+]
+entity_dtype = np.dtype(entity_columns)
+
+# handled separately from the columns above
+string_columns: list[str] = ["name", "description"]
+scheduler_columns: list[str] = ["next_turn", "turn_order"]
+
+# only the player has these, so they go in the meta data
+player_attributes: list[str] = ["food", "max_food", "water", "max_water", "sight_radius", "noise", "action", "statuses", "last_sleep_time"]
+
+def entity_table(level) -> tuple[np.ndarray, list[str], dict[str, list[str]], dict]:
+    queued = {}
+    for entity, next_turn, order in level.scheduler.pending():
+        if entity not in queued or order < queued[entity][1]:
+            queued[entity] = next_turn, order
+
+    strings = {}
+    kinds = {}
+    player = {}
+    table = np.zeros(len(level.entities), dtype=entity_dtype)
+
+    for row, entity in zip(table, level.entities):
+        attributes = entity.state()
+        kind = type(entity).__name__
+        if kind not in kinds:
+            kinds[kind] = [name for name in entity_dtype.names if name in attributes]
+            unknown = set(attributes) - set(kinds[kind]) - set(player_attributes)
+            if unknown:
+                raise TypeError(f"don't know how to save {', '.join(sorted(unknown))} of {kind}")
+
+        row["kind"] = list(kinds).index(kind)
+        for name in kinds[kind]:
+            if name in string_columns:
+                row[name] = strings.setdefault(attributes[name], len(strings))
+            elif name not in scheduler_columns:
+                row[name] = attributes[name]
+        row["next_turn"], row["turn_order"] = queued.get(entity, (-1, -1))
+
+        if isinstance(entity, Player):
+            player = {name: attributes[name] for name in player_attributes}
+
+    return table, list(strings), kinds, player
+
+def save_game(level, path=default_save_path, messages=(), turns=0) -> float:
+    # writes the level to a directory of raw arrays, returning how long
+    # it took. everything goes to a temporary directory first, so a
+    # crash while saving never leaves a half written save behind
+    if not isinstance(level.chars, np.ndarray):
+        raise TypeError("only levels kept entirely in memory can be saved")
+
+    start = time.perf_counter()
+
+    table, strings, kinds, player = entity_table(level)
+    meta = {
+        "format": save_format,
+        "size": list(level.size),
+        "time": level.scheduler.time,
+        "counter": level.scheduler.counter,
+        "strings": strings,
+        "kinds": kinds,
+        "player": player,
+        "messages": list(messages),
+        # how many turns the player had taken, see Game.turns
+        "turns": turns,
+        "rng": streams.getstate(),
+    }
+
+    temp = path + ".tmp"
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+    for name in saved_layers:
+        layer = level.noise.grid if name == "noise" else getattr(level, name)
+        np.save(os.path.join(temp, name + ".npy"), layer)
+    np.save(os.path.join(temp, "entities.npy"), table)
+    with open(os.path.join(temp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    # a level loaded from this save may still have the old files mapped,
+    # which is fine since they stay around until they are unmapped
+    old = path + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(temp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+    return time.perf_counter() - start
+
+class SavedLevel(Level):
+    # a level loaded back from a save. the tile layers are memory mapped
+    # copy on write, so nothing is read from disk until it's looked at
+    # and changes are never written back to the save
+    def __init__(self, path=default_save_path):
+        self.path: str = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta: dict = json.load(f)
+        if self.meta["format"] != save_format:
+            raise ValueError(f"{path} is from an incompatible version of the game")
+
+        super().__init__(tuple(self.meta["size"]))
+
+    def make_layer(self, dtype, fill=0, name=None) -> np.ndarray:
+        if name not in saved_layers:
+            return super().make_layer(dtype, fill, name)
+        return np.load(os.path.join(self.path, name + ".npy"), mmap_mode="c")
+
+    def generate(self, seed) -> dict[str, float]:
+        start = time.perf_counter()
+        meta = self.meta
+
+        table = np.load(os.path.join(self.path, "entities.npy"))
+        kinds = list(meta["kinds"].items())
+        strings = meta["strings"]
+
+        self.scheduler.time = meta["time"]
+        self.scheduler.counter = meta["counter"]
+
+        for row in table:
+            kind, names = kinds[row["kind"]]
+            state = {}
+            for name in names:
+                if name in string_columns:
+                    state[name] = strings[row[name]]
+                elif name not in scheduler_columns:
+                    state[name] = row[name].item()
+            if entity_kinds[kind] is Player:
+                state.update(meta["player"])
+                state["statuses"] = [StatusEffect(status) for status in state["statuses"]]
+            entity = entity_kinds[kind].from_state(state)
+
+            # the layers were saved with every entity already on them
+            self.entities.spawn(entity)
+            synced = self.sync_state(entity)
+            if synced is not None:
+                self.synced[entity] = synced
+            if row["next_turn"] >= 0:
+                self.scheduler.requeue(entity, int(row["next_turn"]), int(row["turn_order"]))
+
+        return {"load": time.perf_counter() - start}
+
+def load_game(path=default_save_path) -> tuple[SavedLevel, list[str]]:
+    level = SavedLevel(path)
+    # the dice pick up where they left off
+    streams.setstate(level.meta["rng"])
+    return level, level.meta["messages"]
+
+def trim_cache(cache_dir, max_bytes) -> None:
+    # removes the least recently used levels until the rest fit
+    levels = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith("level-") and os.path.isdir(path):
+            size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+            levels.append((os.stat(path).st_mtime, size, path))
+
+    total = sum(size for _, size, _ in levels)
+    for _, size, path in sorted(levels):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+def cached_level(size, seed, cache_dir=default_cache_dir, remember=True) -> Level:
+    # a freshly generated level, loaded from the cache if one with the
+    # same seed and size was generated before. the dice have to be seeded
+    # first, they are left as generating the level would have left them.
+    # a level from a seed nobody will ask for again, one that was made
+    # up rather than given, isn't worth remembering
+    if size[0] * size[1] < cache_min_tiles:
+        return Level(size, seed)
+
+    path = os.path.join(cache_dir, f"level-v{generator_version}-{size[0]}x{size[1]}-{seed}")
+    if os.path.exists(path):
+        try:
+            level = load_game(path)[0]
+            # marks it as recently used
+            os.utime(path)
+            return level
+        except (OSError, ValueError, KeyError):
+            # from an older save format, or cut short while being written
+            shutil.rmtree(path, ignore_errors=True)
+
+    level = Level(size, seed)
+    if remember:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            save_game(level, path)
+            trim_cache(cache_dir, cache_max_bytes)
+        except OSError:
+            # the cache is only there to save time
+            pass
+    return level
\ No newline at end of file
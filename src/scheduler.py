@@ -0,0 +1,45 @@
+import heapq
+
+from entity import *
+
+class Scheduler:
+    def __init__(self):
+        # the current game time, in the same units as action_cost
+        self.time: int = 0
+        # (time of next turn, tiebreaker, entity), a min-heap
+        self.queue: list[tuple[int, int, Entity]] = []
+        self.counter: int = 0
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def schedule(self, entity, delay) -> None:
+        entity.next_turn = self.time + delay
+        heapq.heappush(self.queue, (entity.next_turn, self.counter, entity))
+        self.counter += 1
+
+    def pending(self):
+        # yields (entity, time, tiebreaker) of every entry still due to
+        # run, skipping the stale ones advance would skip anyway
+        for time, order, entity in self.queue:
+            if entity.handle is not None and entity.next_turn == time:
+                yield entity, time, order
+
+    def requeue(self, entity, time, order) -> None:
+        # puts back an entry taken from pending, in the same place
+        # relative to everything else in the queue
+        entity.next_turn = time
+        heapq.heappush(self.queue, (time, order, entity))
+
+    def advance(self, duration):
+        # yields every entity whose turn comes up in the next duration
+        # units of time, in order. entries for entities that have since
+        # been despawned or rescheduled are skipped rather than removed
+        end = self.time + duration
+        while self.queue and self.queue[0][0] <= end:
+            time, _, entity = heapq.heappop(self.queue)
+            if entity.handle is None or entity.next_turn != time:
+                continue
+            self.time = time
+            yield entity
+        self.time = end
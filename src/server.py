@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import time
+import numpy as np
+
+from rng import *
+from level import *
+from save import *
+from game import *
+from replay import input_codes, input_steps
+from renderer import compose_frame, camera, game_size
+
+# the game as a service over tcp. the first client to connect plays,
+# everyone else watches, and whoever connected next takes over when the
+# player leaves. clients send the same one letter inputs replays are
+# made of, and get sent the screen as deltas against what they already
+# have: every message is a frame header and then only the cells that
+# changed, as an array of cell indices, one of glyphs and one of colors
+
+default_port: int = 7878
+
+# width, height, whether this client is the player, turn, the player's
+# health and how many cells follow
+frame_header = struct.Struct("<HHBIhH")
+cell_dtypes: list[np.dtype] = [np.dtype("<u2"), np.dtype("<u4"), np.dtype("u1")]
+
+# inputs from the player that haven't been acted on yet. once this many
+# are waiting, their socket isn't read until some have been
+max_pending_inputs: int = 16
+
+# bytes waiting to go out to a client before sending to it waits for it
+# to catch up. one that can't for this long is disconnected
+write_buffer_limit: int = 64 * 1024
+slow_client_timeout: float = 30.0
+
+# frames kept around to send deltas against. a client further behind
+# than this gets the whole screen again
+frame_history: int = 64
+
+def encode_delta(chars, colors, old_chars, old_colors, header) -> bytes:
+    changed = np.flatnonzero((chars != old_chars) | (colors != old_colors))
+    return b"".join([
+        frame_header.pack(chars.shape[1], chars.shape[0], *header, len(changed)),
+        changed.astype(cell_dtypes[0]).tobytes(),
+        chars.flat[changed].astype(cell_dtypes[1]).tobytes(),
+        colors.flat[changed].astype(cell_dtypes[2]).tobytes(),
+    ])
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader: asyncio.StreamReader = reader
+        self.writer: asyncio.StreamWriter = writer
+        # the last frame this client was sent, -1 for none
+        self.frame: int = -1
+        # set whenever there is something newer than what was last sent
+        self.dirty: asyncio.Event = asyncio.Event()
+        self.frames_sent: int = 0
+        self.bytes_sent: int = 0
+
+class Server:
+    def __init__(self, game):
+        self.game: Game = game
+        # in the order they connected, which is the order they get to play in
+        self.clients: dict[Client, None] = {}
+        self.player: Client | None = None
+        self.inputs: asyncio.Queue = asyncio.Queue(max_pending_inputs)
+        # how many inputs have been acted on
+        self.handled: int = 0
+        self.handled_event: asyncio.Event = asyncio.Event()
+        self.turn_task: asyncio.Task | None = None
+
+        # frame number -> (chars, colors), the newest last
+        self.frames: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        self.frame: int = -1
+        # what nothing having been sent looks like
+        self.blank: tuple[np.ndarray, np.ndarray] = (np.full((game_size[1], game_size[0]), -1), np.full((game_size[1], game_size[0]), -1))
+        # (frame the client has, whether it's the player) -> the delta from
+        # there to the newest frame. spectators tend to be on the same frame,
+        # so most of them share one
+        self.deltas: dict[tuple[int, bool], bytes] = {}
+        self.new_frame()
+
+    async def start(self, host="127.0.0.1", port=default_port) -> asyncio.Server:
+        server = await asyncio.start_server(self.handle, host, port)
+        self.turn_task = asyncio.create_task(self.take_turns())
+        return server
+
+    def compose(self) -> tuple[np.ndarray, np.ndarray]:
+        game = self.game
+        level, player = game.level, game.player
+        with game.profiler.phase("compose"):
+            cam_x, cam_y = camera(level, player, game_size)
+            return compose_frame(level, game.active_visibility, player, cam_x, cam_y, game_size)
+
+    def new_frame(self) -> None:
+        self.frame += 1
+        self.chars, self.colors = self.frames[self.frame] = self.compose()
+        self.frames.pop(self.frame - frame_history, None)
+        self.deltas.clear()
+
+    def delta(self, client) -> bytes:
+        key = client.frame, client is self.player
+        data = self.deltas.get(key)
+        if data is None:
+            old_chars, old_colors = self.frames.get(client.frame, self.blank)
+            header = client is self.player, self.game.turns, self.game.player.health
+            data = self.deltas[key] = encode_delta(self.chars, self.colors, old_chars, old_colors, header)
+        return data
+
+    async def take_turns(self) -> None:
+        # the turn loop of the curses front end, with input coming from
+        # the player's socket and the screen going out to every client
+        game = self.game
+        while True:
+            dx, dy, action = await self.inputs.get()
+            game.step(dx, dy, action)
+            self.new_frame()
+            for client in self.clients:
+                client.dirty.set()
+            self.handled += 1
+            self.handled_event.set()
+            # getting from a queue that isn't empty doesn't yield, so
+            # let the clients have the frame before the next turn
+            await asyncio.sleep(0)
+
+    async def handle(self, reader, writer) -> None:
+        client = Client(reader, writer)
+        writer.transport.set_write_buffer_limits(write_buffer_limit)
+        self.clients[client] = None
+        if self.player is None:
+            self.player = client
+        client.dirty.set()
+
+        sending = asyncio.create_task(self.send_frames(client))
+        try:
+            await self.read_inputs(client)
+        except (ConnectionError, asyncio.CancelledError):
+            # gone, or the server is shutting down
+            pass
+        finally:
+            sending.cancel()
+            del self.clients[client]
+            if self.player is client:
+                self.player = next(iter(self.clients), None)
+                if self.player is not None:
+                    # so they find out they are playing now
+                    self.player.dirty.set()
+            writer.close()
+
+    async def read_inputs(self, client) -> None:
+        while data := await client.reader.read(256):
+            if client is not self.player:
+                continue
+            for code in data.decode("ascii", "ignore"):
+                step = input_steps.get(code)
+                if step is not None:
+                    # waits while the queue is full, which stops reading
+                    # from the socket and so slows the client down
+                    await self.inputs.put(step)
+
+    async def send_frames(self, client) -> None:
+        # a client only ever gets the newest frame. while a slow one is
+        # still taking the last, new frames just mark it dirty, and the
+        # next delta covers everything that changed in between
+        try:
+            while True:
+                await client.dirty.wait()
+                client.dirty.clear()
+                data = self.delta(client)
+                client.frame = self.frame
+                client.writer.write(data)
+                client.frames_sent += 1
+                client.bytes_sent += len(data)
+                if client.writer.transport.get_write_buffer_size() > write_buffer_limit:
+                    await asyncio.wait_for(client.writer.drain(), slow_client_timeout)
+        except (ConnectionError, asyncio.TimeoutError):
+            # closing would wait for the buffered frames to go out first
+            client.writer.transport.abort()
+
+class Viewer:
+    # the client end, keeping its own copy of the screen
+    def __init__(self):
+        self.chars: np.ndarray = np.zeros((game_size[1], game_size[0]), dtype=np.int64)
+        self.colors: np.ndarray = np.zeros((game_size[1], game_size[0]), dtype=np.int64)
+        self.playing: bool = False
+        self.turns: int = 0
+        self.health: int = 0
+        self.frames: int = 0
+
+    async def connect(self, host="127.0.0.1", port=default_port) -> None:
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    def send(self, dx, dy, action="move") -> None:
+        code = input_codes[dx, dy]
+        self.writer.write((code.upper() if action == "attack" else code).encode())
+
+    async def read_frame(self) -> None:
+        width, height, playing, self.turns, self.health, cells = frame_header.unpack(await self.reader.readexactly(frame_header.size))
+        self.playing = bool(playing)
+        if self.chars.shape != (height, width):
+            self.chars = np.zeros((height, width), dtype=np.int64)
+            self.colors = np.zeros((height, width), dtype=np.int64)
+
+        data = await self.reader.readexactly(cells * sum(dtype.itemsize for dtype in cell_dtypes))
+        arrays = []
+        offset = 0
+        for dtype in cell_dtypes:
+            arrays.append(np.frombuffer(data, dtype, cells, offset))
+            offset += cells * dtype.itemsize
+        changed, chars, colors = arrays
+        self.chars.flat[changed] = chars
+        self.colors.flat[changed] = colors
+        self.frames += 1
+
+    async def watch(self) -> None:
+        try:
+            while True:
+                await self.read_frame()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def close(self) -> None:
+        self.writer.close()
+
+async def loopback(game, clients, turns, seed) -> int:
+    # a server with clients on the same machine, the first of which does a
+    # random walk. returns how many clients ended up with the wrong screen
+    server = Server(game)
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+
+    viewers = [Viewer() for _ in range(clients)]
+    for viewer in viewers:
+        await viewer.connect(port=port)
+    watching = [asyncio.create_task(viewer.watch()) for viewer in viewers]
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(turns):
+        viewers[0].send(*rng.choice(list(input_codes)))
+    while server.handled < turns:
+        server.handled_event.clear()
+        await server.handled_event.wait()
+    # then give every client a chance to catch up on the last frame
+    def caught_up(viewer):
+        return np.array_equal(viewer.chars, server.chars) and np.array_equal(viewer.colors, server.colors)
+    deadline = time.perf_counter() + slow_client_timeout
+    while not all(caught_up(viewer) for viewer in viewers) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    frames = sum(client.frames_sent for client in server.clients)
+    sent = sum(client.bytes_sent for client in server.clients)
+    full = frame_header.size + game_size[0] * game_size[1] * sum(dtype.itemsize for dtype in cell_dtypes)
+    print(f"{clients} clients, {turns} inputs in {elapsed:.2f}s, {turns / elapsed:.0f} inputs/sec")
+    print(f"{frames} frames sent, {frames / clients / turns:.2f} per client per input, {sent / max(frames, 1):.0f} bytes each on average against {full} for a full screen")
+    wrong = sum(not caught_up(viewer) for viewer in viewers)
+
+    for viewer in viewers:
+        viewer.close()
+    await asyncio.gather(*watching)
+    listener.close()
+    server.turn_task.cancel()
+    return wrong
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve a game over tcp.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--size", type=int, nargs=2, default=[200, 100], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--loopback", type=int, metavar="CLIENTS", help="connect this many clients on this machine, play --turns and exit")
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    seed = streams.seed(args.seed)
+    game = Game(cached_level(tuple(args.size), seed, remember=args.seed is not None))
+    game.start()
+
+    if args.loopback:
+        wrong = asyncio.run(loopback(game, args.loopback, args.turns, seed))
+        if wrong:
+            print(f"{wrong} clients ended up with the wrong screen")
+            return 1
+        print("every client ended up with the right screen")
+        return 0
+
+    async def serve():
+        server = await Server(game).start(args.host, args.port)
+        print(f"serving on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
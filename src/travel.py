@@ -0,0 +1,152 @@
+import numpy as np
+import tcod.path
+
+from entity import *
+from navigation import *
+from perception import *
+
+# how far around the player and where they're going travelling and
+# exploring look for a way to go, in tiles
+travel_radius: int = 100
+
+# the most turns one command takes, in case it never finds a reason to stop
+max_travel_steps: int = 1000
+
+def travel_costs(level, player, window, visible) -> np.ndarray:
+    # like Navigation.costs, but only over tiles the player has seen,
+    # with anything solid they know of that can't be opened in the way,
+    # and going out of the way not to step on broken glass. visible is
+    # what the player can see of the level right now
+    seen = level.seen[window]
+    known = seen & level.transparent[window]
+    path_costs = level.path_costs[window]
+    cost = np.where(known, 1 + path_costs, 0).astype(np.int32)
+
+    store = level.entities
+    rows = np.flatnonzero(store.alive & store.columns["solid"])
+    x0, y0 = window[1].start, window[0].start
+    i, j = store.columns["x"][rows] - x0, store.columns["y"][rows] - y0
+    inside = (i >= 0) & (i < cost.shape[1]) & (j >= 0) & (j < cost.shape[0])
+    rows, i, j = rows[inside], i[inside], j[inside]
+    # the player only knows what is there the way it's drawn, anything
+    # in view, and anything detectable where they've been before. a
+    # zombie out of sight is found when it gets in the way
+    detectable = np.array([store.rows[row].detectable for row in rows], dtype=bool)
+    blocking = visible[window][j, i] | (detectable & seen[j, i])
+    i, j = i[blocking], j[blocking]
+    cost[j, i] = np.where(path_costs[j, i] > 0, cost[j, i], 0)
+
+    # broken glass doesn't slow anyone down, but it does cut
+    for row in store.select(Window):
+        glass = store.rows[row]
+        i, j = glass.x - x0, glass.y - y0
+        if glass.broken and 0 <= i < cost.shape[1] and 0 <= j < cost.shape[0] and cost[j, i]:
+            cost[j, i] += window_path_cost
+
+    # the player is solid too, but has to be able to leave their tile
+    cost[player.y - y0, player.x - x0] = 1
+    return cost
+
+def frontier(cost, seen) -> np.ndarray:
+    # walkable tiles next to one that hasn't been seen yet
+    unseen = np.pad(~seen, 1, constant_values=False)
+    edge = unseen[:-2, 1:-1] | unseen[2:, 1:-1] | unseen[1:-1, :-2] | unseen[1:-1, 2:]
+    return (cost > 0) & edge
+
+# walks the player somewhere, to a tile or to the nearest place that
+# hasn't been explored, as one command. every turn on the way is taken
+# like any other, but nothing is drawn until it stops, and the map it
+# follows is only rebuilt when the level's paths change or it runs out
+class Travel:
+    def __init__(self, game, goal=None):
+        self.game = game
+        # None to explore
+        self.goal: tuple[int, int] | None = goal
+
+        self.map: DijkstraMap | None = None
+        self.key = None
+        # tiles found to be locked on the way
+        self.avoid: set[tuple[int, int]] = set()
+
+    def build_map(self) -> DijkstraMap | None:
+        level, player = self.game.level, self.game.player
+        # around the player, and the goal if there is one
+        gx, gy = (player.x, player.y) if self.goal is None else self.goal
+        x0, y0 = max(0, min(player.x, gx) - travel_radius), max(0, min(player.y, gy) - travel_radius)
+        x1, y1 = min(level.size[0], max(player.x, gx) + travel_radius + 1), min(level.size[1], max(player.y, gy) + travel_radius + 1)
+        window = np.s_[y0:y1, x0:x1]
+        cost = travel_costs(level, player, window, self.game.active_visibility)
+        for x, y in self.avoid:
+            if x0 <= x < x1 and y0 <= y < y1:
+                cost[y - y0, x - x0] = 0
+
+        dist = tcod.path.maxarray(cost.shape, dtype=np.int32)
+        if self.goal is None:
+            goals = frontier(cost, level.seen[window])
+            # where the player stands doesn't count, they can see around it
+            goals[player.y - y0, player.x - x0] = False
+            dist[goals] = 0
+        else:
+            i, j = self.goal[0] - x0, self.goal[1] - y0
+            if not (0 <= i < cost.shape[1] and 0 <= j < cost.shape[0]) or not cost[j, i]:
+                return None
+            dist[j, i] = 0
+        tcod.path.dijkstra2d(dist, cost, 1, None, out=dist)
+        return DijkstraMap(dist, x0, y0)
+
+    def next_step(self) -> tuple[int, int] | None:
+        level, player = self.game.level, self.game.player
+        # arriving somewhere that was worth exploring is the same as
+        # running out of map, either way a new one has to be found
+        stale = self.map is None or self.map.at(player.x, player.y) in (0, unreachable)
+        if stale or self.key != level.path_version:
+            self.map = self.build_map()
+            self.key = level.path_version
+        if self.map is None:
+            return None
+        return self.map.step(player.x, player.y)
+
+    def zombies_in_view(self) -> set[int]:
+        game = self.game
+        store = game.level.entities
+        rows = store.select(Zombie)
+        xs, ys = store.columns["x"][rows], store.columns["y"][rows]
+        visible = in_view(xs, ys, game.active_visibility[game.fov_window], game.fov_window)
+        return {store.rows[row].handle for row in rows[visible]}
+
+    def run(self) -> str | None:
+        # takes turns until there is a reason to stop, returning the
+        # reason if the player should be told
+        game, player = self.game, self.game.player
+        seen = self.zombies_in_view()
+
+        for _ in range(max_travel_steps):
+            step = self.next_step()
+            if step is None:
+                if self.goal is None:
+                    return "There's nowhere left to explore."
+                if (player.x, player.y) != self.goal:
+                    return "You can't find a way there."
+                return None
+
+            x, y = player.x + step[0], player.y + step[1]
+            if any(e.solid and not e.path_cost() for e in game.level.entities.at(x, y)):
+                # something has got in the way since the map was built,
+                # and walking into it would be attacking it
+                return "Something is in the way."
+
+            health = player.health
+            if not game.step(*step):
+                # opening a door takes a bump without going anywhere, one
+                # that's still shut after it is locked, so find another way
+                if any(e.solid for e in game.level.entities.at(x, y)):
+                    self.avoid.add((x, y))
+                    self.map = None
+
+            if player.health < health:
+                return None
+            now_seen = self.zombies_in_view()
+            if now_seen - seen:
+                return "A zombie comes into view."
+            seen = now_seen
+        return None
\ No newline at end of file
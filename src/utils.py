@@ -1 +1,8 @@
-solids = 'T^#=+'
\ No newline at end of file
+solids = 'T^#=+'
+
+# how long an action takes for something of speed 100
+action_cost = 100
+
+# extra pathfinding cost of the things zombies have to break through
+door_path_cost = 8
+window_path_cost = 4
\ No newline at end of file
@@ -0,0 +1,265 @@
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import weakref
+import numpy as np
+
+from collections import OrderedDict
+
+from entity import *
+from level import *
+from worldgen import *
+from rng import *
+
+# width and height of a chunk, in tiles
+chunk_size: int = 64
+# chunks this many chunks away from the player are always kept loaded
+stream_radius: int = 1
+
+class ChunkedLayer:
+    # stands in for a tile layer of a ChunkedLevel. supports the
+    # indexing the rest of the game does on layers, [y, x] with ints or
+    # slices, and loads or generates chunks as they are touched
+    def __init__(self, level, index, dtype, fill):
+        self.level = level
+        self.index: int = index
+        self.dtype: np.dtype = np.dtype(dtype)
+        self.fill = fill
+        self.shape: tuple[int, int] = (level.size[1], level.size[0])
+
+    def new_block(self) -> np.ndarray:
+        return np.full((chunk_size, chunk_size), self.fill, dtype=self.dtype)
+
+    def blocks(self) -> list[np.ndarray]:
+        # this layer's array in every loaded chunk
+        return [chunk[self.index] for chunk in self.level.chunks.values()]
+
+    def bounds(self, key, axis):
+        # (start, stop, is an int) of one axis of an index
+        size = self.shape[axis]
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise IndexError("chunked layers don't support slice steps")
+            start, stop, _ = key.indices(size)
+            return start, max(start, stop), False
+        key = int(key)
+        if not 0 <= key < size:
+            raise IndexError(f"index {key} is out of bounds for axis {axis} with size {size}")
+        return key, key + 1, True
+
+    def spans(self, y0, y1, x0, x1):
+        # yields (chunk array slice, output slice, chunk key) for
+        # every chunk overlapping the given rectangle
+        for cy in range(y0 // chunk_size, (y1 - 1) // chunk_size + 1):
+            for cx in range(x0 // chunk_size, (x1 - 1) // chunk_size + 1):
+                by0, bx0 = cy * chunk_size, cx * chunk_size
+                sy0, sy1 = max(y0, by0), min(y1, by0 + chunk_size)
+                sx0, sx1 = max(x0, bx0), min(x1, bx0 + chunk_size)
+                yield (
+                    np.s_[sy0 - by0:sy1 - by0, sx0 - bx0:sx1 - bx0],
+                    np.s_[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0],
+                    (cx, cy),
+                )
+
+    def __getitem__(self, key):
+        ky, kx = key
+        y0, y1, y_int = self.bounds(ky, 0)
+        x0, x1, x_int = self.bounds(kx, 1)
+
+        if y_int and x_int:
+            block = self.level.chunk(x0 // chunk_size, y0 // chunk_size)[self.index]
+            return block[y0 % chunk_size, x0 % chunk_size]
+
+        out = np.empty((y1 - y0, x1 - x0), dtype=self.dtype)
+        if out.size:
+            for inner, outer, (cx, cy) in self.spans(y0, y1, x0, x1):
+                out[outer] = self.level.chunk(cx, cy)[self.index][inner]
+
+        if y_int:
+            return out[0]
+        if x_int:
+            return out[:, 0]
+        return out
+
+    def __setitem__(self, key, value):
+        ky, kx = key
+        y0, y1, y_int = self.bounds(ky, 0)
+        x0, x1, x_int = self.bounds(kx, 1)
+
+        if y_int and x_int:
+            block = self.level.chunk(x0 // chunk_size, y0 // chunk_size)[self.index]
+            block[y0 % chunk_size, x0 % chunk_size] = value
+            return
+
+        if (y1 - y0) * (x1 - x0) == 0:
+            return
+        value = np.asarray(value)
+        if y_int:
+            value = value[None]
+        elif x_int and value.ndim:
+            value = value[:, None]
+        value = np.broadcast_to(value, (y1 - y0, x1 - x0))
+        for inner, outer, (cx, cy) in self.spans(y0, y1, x0, x1):
+            self.level.chunk(cx, cy)[self.index][inner] = value[outer]
+
+class ChunkedLevel(Level):
+    # a level too big to keep in memory. it is split into chunks that are
+    # generated the first time they are needed, kept in memory up to a
+    # budget, and written to disk once they are far from the player.
+    # while on disk, a chunk's entities are frozen in time. their next
+    # turns and lifecycle deadlines are kept in game time, so whatever
+    # fell due while they were away happens as soon as they're back.
+    def __init__(self, size:tuple[int, int]=(4096, 4096), seed:int|None=None, memory_budget:int=32 * 2**20, cache_dir:str|None=None):
+        if seed is None:
+            seed = new_seed()
+        self.seed: int = seed
+
+        self.layers: list[ChunkedLayer] = []
+        # (cx, cy) -> one array per layer, least recently used first
+        self.chunks: OrderedDict[tuple[int, int], list[np.ndarray]] = OrderedDict()
+        self.memory_budget: int = memory_budget
+        self.cache_dir: str = cache_dir if cache_dir is not None else tempfile.mkdtemp(prefix="hivemind-")
+        # a directory made up for the level is removed when the level is
+        # closed or collected, or when the game exits
+        self.remove_cache = weakref.finalize(self, shutil.rmtree, self.cache_dir, ignore_errors=True) if cache_dir is None else None
+        # chunks on disk, and the game time they were put there
+        self.evicted: dict[tuple[int, int], int] = {}
+
+        super().__init__(size, seed)
+
+    def close(self) -> None:
+        if self.remove_cache is not None:
+            self.remove_cache()
+
+    def make_layer(self, dtype, fill=0, name=None) -> ChunkedLayer:
+        layer = ChunkedLayer(self, len(self.layers), dtype, fill)
+        self.layers.append(layer)
+        for arrays in self.chunks.values():
+            arrays.append(layer.new_block())
+        return layer
+
+    def chunk_bytes(self) -> int:
+        return sum(layer.dtype.itemsize for layer in self.layers) * chunk_size * chunk_size
+
+    def memory_used(self) -> int:
+        return len(self.chunks) * self.chunk_bytes()
+
+    def generate(self, seed) -> dict[str, float]:
+        # only the chunks around the player are made up front, so
+        # startup doesn't depend on the size of the world
+        start = time.perf_counter()
+        x, y = self.size[0] // 2, self.size[1] // 2
+        self.stream_around(x, y)
+        self.add_entity(Player(x, y, int(np.random.default_rng(seed).integers(1, 7))))
+        return {"chunks": time.perf_counter() - start}
+
+    def update_transparency(self) -> None:
+        for arrays in self.chunks.values():
+            self.refresh_chunk(arrays)
+        self.version += 1
+        self.path_version += 1
+
+    def refresh_chunk(self, arrays) -> None:
+        transparent = ~np.isin(arrays[self.chars.index], solid_codes)
+        arrays[self.transparent.index][:] = transparent
+        arrays[self.fov_map.index][:] = transparent & (arrays[self.blockers.index] == 0)
+
+    def chunk_path(self, cx, cy) -> str:
+        return os.path.join(self.cache_dir, f"chunk_{cx}_{cy}")
+
+    def chunk(self, cx, cy) -> list[np.ndarray]:
+        arrays = self.chunks.get((cx, cy))
+        if arrays is None:
+            arrays = self.load_chunk(cx, cy)
+        else:
+            self.chunks.move_to_end((cx, cy))
+        return arrays
+
+    def load_chunk(self, cx, cy) -> list[np.ndarray]:
+        arrays = [layer.new_block() for layer in self.layers]
+        # registered before anything is added to it, since adding
+        # entities touches the chunk's layers again
+        self.chunks[(cx, cy)] = arrays
+
+        if (cx, cy) in self.evicted:
+            path = self.chunk_path(cx, cy)
+            with np.load(path + ".npz") as data:
+                for name in ["chars", "colors", "seen"]:
+                    arrays[getattr(self, name).index][:] = data[name]
+            with open(path + ".pickle", "rb") as f:
+                sleeping = pickle.load(f)
+            elapsed = self.scheduler.time - self.evicted.pop((cx, cy))
+
+            self.refresh_chunk(arrays)
+            for entity, delay in sleeping:
+                self.add_entity(entity, None if delay is None else max(0, delay - elapsed))
+        else:
+            entities = self.generate_chunk(cx, cy, arrays)
+            self.refresh_chunk(arrays)
+            for entity in entities:
+                self.add_entity(entity)
+
+        self.version += 1
+        self.path_version += 1
+        return arrays
+
+    def generate_chunk(self, cx, cy, arrays) -> list[Entity]:
+        rng = np.random.default_rng([self.seed, cx, cy])
+        chars, colors = arrays[self.chars.index], arrays[self.colors.index]
+        x0, y0 = cx * chunk_size, cy * chunk_size
+
+        xs = (x0 + np.arange(chunk_size)) / self.size[0]
+        ys = (y0 + np.arange(chunk_size)) / self.size[1]
+        trees = tree_ring(xs, ys, rng)
+        chars[trees] = ord('T')
+        colors[trees] = 2
+
+        if rng.random() >= 0.5:
+            return []
+
+        # buildings are kept clear of the chunk's edges
+        # so they never straddle two chunks
+        w, h = int(rng.integers(9, 16)), int(rng.integers(5, 9))
+        rect = (int(rng.integers(1, chunk_size - w - 1)), int(rng.integers(1, chunk_size - h - 1)), w, h)
+        gaps = draw_building(chars, colors, *rect)
+        return furnish_building(chars, colors, rng, rect, gaps, x0, y0)
+
+    def evict(self, cx, cy) -> None:
+        x0, y0 = cx * chunk_size, cy * chunk_size
+        now = self.scheduler.time
+
+        sleeping = []
+        for entity in self.entities.in_rect(x0, y0, x0 + chunk_size, y0 + chunk_size):
+            if isinstance(entity, Player):
+                continue
+            delay = None if entity.next_turn is None else max(0, entity.next_turn - now)
+            self.remove_entity(entity)
+            # it isn't dead, just asleep on disk
+            entity.marked_for_death = False
+            sleeping.append((entity, delay))
+
+        arrays = self.chunks.pop((cx, cy))
+        path = self.chunk_path(cx, cy)
+        np.savez(path + ".npz", **{name: arrays[getattr(self, name).index] for name in ["chars", "colors", "seen"]})
+        with open(path + ".pickle", "wb") as f:
+            pickle.dump(sleeping, f)
+        self.evicted[(cx, cy)] = now
+
+    def stream_around(self, x, y) -> None:
+        cx, cy = x // chunk_size, y // chunk_size
+        keep = set()
+        for j in range(cy - stream_radius, cy + stream_radius + 1):
+            for i in range(cx - stream_radius, cx + stream_radius + 1):
+                if 0 <= i * chunk_size < self.size[0] and 0 <= j * chunk_size < self.size[1]:
+                    keep.add((i, j))
+                    self.chunk(i, j)
+
+        # least recently used chunks go to disk first, but never
+        # the ones around the player
+        while self.memory_used() > self.memory_budget:
+            victim = next((key for key in self.chunks if key not in keep), None)
+            if victim is None:
+                break
+            self.evict(*victim)
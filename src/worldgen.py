@@ -0,0 +1,136 @@
+import time
+import numpy as np
+
+from entity import *
+
+# a level is generated in stages, each one handed the level, a seeded
+# numpy rng and the results of the stages before it. the same seed
+# always produces the same level.
+def tree_ring(xs, ys, rng) -> np.ndarray:
+    # a ring of trees around the edge of the map, getting denser the
+    # further out you go. xs and ys are positions from 0 to 1 across it
+    dist = np.hypot(xs[None, :] - 0.5, ys[:, None] - 0.5)
+    return (dist > 0.45) & (rng.random(dist.shape) ** 2 < (dist - 0.45) * 20)
+
+def draw_building(chars, colors, x0, y0, w, h) -> list[tuple[int, int]]:
+    # draws the outside walls of a building, returning the spots on them
+    # that become doors, windows or more wall later on. buildings near
+    # the edge of a small level are cut off by it
+    height, width = chars.shape
+    x1, y1 = x0 + w, y0 + h
+    gaps = [
+        (x, y)
+        for x in [x0 + w // 3, x0 + int(w * (2 / 3))]
+        for y in [y0, y1]
+    ] + [
+        (x, y)
+        for y in [y0 + h // 3, y0 + int(h * (2 / 3))]
+        for x in [x0, x1]
+    ]
+    gaps = [(x, y) for x, y in gaps if 0 <= x < width and 0 <= y < height]
+    under = [(chars[y, x], colors[y, x]) for x, y in gaps]
+
+    xs, ys = np.s_[max(0, x0):x1 + 1], np.s_[max(0, y0):y1 + 1]
+    walls = [np.s_[y, xs] for y in [y0, y1] if 0 <= y < height] + [np.s_[ys, x] for x in [x0, x1] if 0 <= x < width]
+    for wall in walls:
+        chars[wall] = ord('#')
+        colors[wall] = 0
+
+    # the gaps are left as they were for now
+    for (x, y), (char, color) in zip(gaps, under):
+        chars[y, x], colors[y, x] = char, color
+    return gaps
+
+def furnish_building(chars, colors, rng, rect, gaps, ox=0, oy=0) -> list[Entity]:
+    # fills the gaps of a building and returns the doors, windows and
+    # corpse that go in it. (ox, oy) is where chars starts on the map
+    x0, y0, w, h = rect
+    entities = []
+
+    for i, k in enumerate(rng.permutation(len(gaps))):
+        x, y = gaps[k]
+        if i <= 1:
+            # place 2 doors on the outside of each house
+            entities.append(Door(ox + x, oy + y, bool(rng.random() < 0.8)))
+        elif rng.random() < 0.5:
+            # randomly place windows
+            window = Window(ox + x, oy + y, bool(rng.random() < 0.8))
+
+            if rng.random() < 0.1:
+                # 10% chance for the window to be broken
+                window.broken = True
+                window.char = 'X'
+                window.solid = False
+
+            entities.append(window)
+        else:
+            chars[y, x] = ord('#')
+            colors[y, x] = 0
+
+    rx = int(rng.integers(x0 + 1, x0 + w - 1))
+    ry = int(rng.integers(y0 + 1, y0 + h - 1))
+
+    if 0 <= rx < chars.shape[1] and 0 <= ry < chars.shape[0] and chars[ry, rx] == ord('.'):
+        entities.append(Corpse(ox + rx, oy + ry, int(rng.integers(80, 201))))
+
+    return entities
+
+def terrain(level, rng, state):
+    xs = np.arange(level.size[0]) / level.size[0]
+    ys = np.arange(level.size[1]) / level.size[1]
+    trees = tree_ring(xs, ys, rng)
+    level.chars[trees] = ord('T')
+    level.colors[trees] = 2
+
+def structures(level, rng, state, building_density=4):
+    buildings = []
+
+    for i in range(building_density):
+        for j in range(building_density):
+            cx = (i + 1) * (level.size[0] // (building_density + 1))
+            cy = (j + 1) * (level.size[1] // (building_density + 1))
+
+            rect = (
+                int(rng.integers(cx - 3, cx + 4)),
+                int(rng.integers(cy - 3, cy + 4)),
+                int(rng.integers(9, 16)),
+                int(rng.integers(5, 9))
+            )
+            buildings.append((rect, draw_building(level.chars, level.colors, *rect)))
+
+    state['buildings'] = buildings
+
+def props(level, rng, state):
+    for rect, gaps in state['buildings']:
+        for entity in furnish_building(level.chars, level.colors, rng, rect, gaps):
+            level.add_entity(entity)
+
+def spawns(level, rng, state):
+    level.add_entity(Player(level.size[0] // 2, level.size[1] // 2, int(rng.integers(1, 7))))
+
+# bumped whenever a seed would generate something different, so levels
+# cached by an older version aren't used
+generator_version: int = 1
+
+stages = [
+    ("terrain", terrain),
+    ("structures", structures),
+    ("props", props),
+    ("spawns", spawns),
+]
+
+def generate(level, seed=None) -> dict[str, float]:
+    # runs every stage on the level, returning how long each took
+    rng = np.random.default_rng(seed)
+    state = {}
+    timings = {}
+
+    for name, stage in stages:
+        start = time.perf_counter()
+        stage(level, rng, state)
+        timings[name] = time.perf_counter() - start
+
+    # the stages write straight into the tile arrays
+    level.update_transparency()
+
+    return timings